@@ -1,20 +1,31 @@
+import asyncio
 import logging
 import sqlite3
 from datetime import date, timedelta, time, datetime
 import os
 import threading
-from http.server import BaseHTTPRequestHandler, HTTPServer
+from time import monotonic
 import csv
-import tempfile
+import functools
+import heapq
+import io
+import json
+import re
+from collections import OrderedDict
+from contextlib import contextmanager
 
 from telegram import (
     Update,
+    InputFile,
     InlineKeyboardMarkup,
     InlineKeyboardButton,
     ReplyKeyboardMarkup,
     KeyboardButton,
+    LinkPreviewOptions,
 )
 
+from telegram.error import BadRequest, RetryAfter
+from telegram.helpers import escape_markdown
 from telegram.ext import (
     Application,
     CommandHandler,
@@ -22,6 +33,8 @@ from telegram.ext import (
     CallbackQueryHandler,
     MessageHandler,
     ConversationHandler,
+    Defaults,
+    PicklePersistence,
     filters,
 )
 
@@ -46,6 +59,12 @@ ADD_NAME, ADD_SEX, ADD_CAGE, ADD_SECTION, ADD_WEIGHT = range(5)
 OWNER_ID = 5891168987 # <<< CHANGE THIS to your Telegram user ID to make the bot private
 
 DB_FILE = "rabbits.db"
+# Seconds a connection waits on a locked database before "database is
+# locked". WAL readers never block writers, so this only covers a writer
+# waiting on another writer or a checkpoint; sqlite3's default is 5.
+DB_BUSY_TIMEOUT = 15.0
+# user_data / conversation state, so a half-finished /addrabbit survives restarts
+STATE_FILE = "bot_state.pickle"
 
 GESTATION_DAYS = 31
 WEANING_DAYS = 35
@@ -54,11 +73,81 @@ WEANING_DAYS = 35
 # ================== DB HELPERS ==================
 
 def get_db():
-    conn = sqlite3.connect(DB_FILE)
+    conn = sqlite3.connect(DB_FILE, timeout=DB_BUSY_TIMEOUT)
     conn.row_factory = sqlite3.Row
     return conn
 
 
+_db_local = threading.local()
+
+
+@contextmanager
+def db_session():
+    """
+    Yield this thread's connection. It is opened on first use and kept for
+    the life of the thread, so read helpers don't reconnect on every call.
+    A transaction left open when the outermost block exits is rolled back,
+    as closing the connection used to do.
+    """
+    conn = getattr(_db_local, "conn", None)
+    if conn is None:
+        conn = _db_local.conn = get_db()
+        # Per-connection settings, applied once since the connection stays open
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+    depth = getattr(_db_local, "depth", 0)
+    _db_local.depth = depth + 1
+    try:
+        yield conn
+    finally:
+        _db_local.depth = depth
+        if depth == 0 and conn.in_transaction:
+            conn.rollback()
+
+
+# Long-lived connection used only to read PRAGMA data_version, which changes
+# whenever any other connection commits to the database.
+_version_conn = None
+_version_lock = threading.Lock()
+
+
+def db_data_version() -> int:
+    global _version_conn
+    with _version_lock:
+        if _version_conn is None:
+            _version_conn = sqlite3.connect(DB_FILE, timeout=DB_BUSY_TIMEOUT,
+                                            check_same_thread=False)
+        return _version_conn.execute("PRAGMA data_version").fetchone()[0]
+
+
+def ttl_cache(seconds: float, maxsize: int = 256):
+    """
+    Memoize a read-only DB helper by its arguments for up to `seconds`.
+    Entries are also dropped as soon as anything is committed (checked via
+    db_data_version), so results are never staler than the database; the
+    TTL only bounds date-dependent output such as ages.
+    """
+    def decorator(fn):
+        cache = {}
+
+        @functools.wraps(fn)
+        def wrapper(*args):
+            version = db_data_version()
+            now = monotonic()
+            hit = cache.get(args)
+            if hit is not None and hit[0] == version and now < hit[1]:
+                return hit[2]
+            value = fn(*args)
+            if len(cache) >= maxsize:
+                cache.clear()
+            cache[args] = (version, now + seconds, value)
+            return value
+
+        wrapper.cache_clear = cache.clear
+        return wrapper
+    return decorator
+
+
 def safe_alter(cur, sql):
     try:
         cur.execute(sql)
@@ -69,6 +158,8 @@ def safe_alter(cur, sql):
 def init_db():
     conn = get_db()
     cur = conn.cursor()
+    # WAL is persistent in the DB file, so setting it once here is enough
+    cur.execute("PRAGMA journal_mode=WAL")
 
     # Rabbits
     cur.execute("""
@@ -86,6 +177,8 @@ def init_db():
     safe_alter(cur, "ALTER TABLE rabbits ADD COLUMN death_date TEXT")
     safe_alter(cur, "ALTER TABLE rabbits ADD COLUMN death_reason TEXT")
     safe_alter(cur, "ALTER TABLE rabbits ADD COLUMN photo_file_id TEXT")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_rabbits_mother ON rabbits(mother_id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_rabbits_father ON rabbits(father_id)")
 
     # Breedings
     cur.execute("""
@@ -170,6 +263,8 @@ def init_db():
             done INTEGER DEFAULT 0
         )
     """)
+    # Open tasks by date: /tasklist, /today and the daily summary
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_tasks_pending ON tasks(done, task_date)")
 
     # Settings (for climate, etc.)
     cur.execute("""
@@ -192,6 +287,11 @@ def init_db():
     conn.close()
 
 
+# Settings are only written through set_setting() (and wiped by /resetfarm),
+# so reads can be served from memory until the next write.
+SETTINGS_CACHE = {}
+
+
 def set_setting(key: str, value: str):
     conn = get_db()
     cur = conn.cursor()
@@ -202,6 +302,7 @@ def set_setting(key: str, value: str):
     """, (key, value))
     conn.commit()
     conn.close()
+    SETTINGS_CACHE[key] = value
 
 # ========= Achievements helper (temporary no-op) =========
 def unlock_achievement(code: str):
@@ -213,14 +314,35 @@ def unlock_achievement(code: str):
     return
 
 
+ACHIEVEMENT_DESCRIPTIONS = {
+    "first_rabbit": "🐰 First Rabbit: added your first rabbit.",
+    "ten_rabbits": "🐇 Growing Herd: 10 rabbits in database.",
+    "fifty_rabbits": "🏡 Big Herd: 50 rabbits in database.",
+    "first_litter": "🏅 Starter Breeder: recorded your first litter.",
+    "fifty_kits": "🐇 Baby Boom: 50 kits recorded.",
+    "two_hundred_kits": "🐰 Mega Farm: 200+ kits recorded.",
+    "first_sale": "💸 First Sale: sold your first rabbit.",
+    "profit_positive": "💰 In the Green: overall profit is positive.",
+}
+
+
+def describe_achievement(key: str) -> str:
+    """Human-readable text for an achievement key (falls back to the key)."""
+    return ACHIEVEMENT_DESCRIPTIONS.get(key, key)
+
+
 
 def get_setting(key: str):
+    if key in SETTINGS_CACHE:
+        return SETTINGS_CACHE[key]
     conn = get_db()
     cur = conn.cursor()
     cur.execute("SELECT value FROM settings WHERE key=?", (key,))
     row = cur.fetchone()
     conn.close()
-    return row["value"] if row else None
+    value = row["value"] if row else None
+    SETTINGS_CACHE[key] = value
+    return value
 
 
 # ================== OWNER CHECK (PRIVACY) ==================
@@ -238,6 +360,10 @@ def is_owner(update: Update) -> bool:
     return user is not None and user.id == OWNER_ID
 
 
+# Same rule as is_owner(), as a filter that can be attached to handlers.
+OWNER_FILTER = filters.User(user_id=OWNER_ID) if OWNER_ID else filters.ALL
+
+
 async def ensure_owner(update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
     """Returns True if caller is owner, else sends error and returns False."""
     if not is_owner(update):
@@ -249,6 +375,33 @@ async def ensure_owner(update: Update, context: ContextTypes.DEFAULT_TYPE) -> bo
     return True
 
 
+def owner_required(handler):
+    """
+    Decorator for handlers: runs the handler only for the owner (see
+    is_owner). Others get ensure_owner's refusal and END, which also stops
+    a conversation entry point from starting the wizard.
+
+    Only for callback-query entry points (menu_callback, addrabbit_start):
+    CallbackQueryHandler takes no filters. Commands are gated by
+    registering them with OWNER_FILTER (see OWNER_COMMANDS) instead.
+    """
+    @functools.wraps(handler)
+    async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE, *args, **kwargs):
+        if not is_owner(update):
+            await ensure_owner(update, context)
+            return ConversationHandler.END
+        return await handler(update, context, *args, **kwargs)
+    return wrapper
+
+
+async def not_owner_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Refusal for anyone but the owner using one of OWNER_COMMANDS. Those are
+    registered with OWNER_FILTER, so this is where strangers get the reply.
+    """
+    await ensure_owner(update, context)
+
+
 # ================== BASIC RABBIT FUNCS ==================
 
 def add_rabbit(name, sex):
@@ -257,6 +410,45 @@ def add_rabbit(name, sex):
     try:
         cur.execute("INSERT INTO rabbits(name, sex) VALUES (?, ?)", (name, sex))
         conn.commit()
+        invalidate_rabbit_cache()
+
+        # === Achievements: rabbit counts ===
+        cur.execute("SELECT COUNT(*) AS c FROM rabbits")
+        total = cur.fetchone()["c"]
+        if total == 1:
+            unlock_achievement("first_rabbit")
+        if total >= 10:
+            unlock_achievement("ten_rabbits")
+        if total >= 50:
+            unlock_achievement("fifty_rabbits")
+
+        return True
+    except sqlite3.IntegrityError:
+        return False
+    finally:
+        conn.close()
+
+
+def add_rabbit_full(name, sex, cage=None, section=None, weight_kg=None):
+    """
+    Insert a rabbit together with its cage/section and first weight in one
+    transaction (used by the add-rabbit wizard). Returns False if the name
+    is already taken, in which case nothing is written.
+    """
+    conn = get_db()
+    cur = conn.cursor()
+    try:
+        with conn:
+            cur.execute(
+                "INSERT INTO rabbits(name, sex, cage, section) VALUES (?, ?, ?, ?)",
+                (name, sex, cage, section if cage else None),
+            )
+            if weight_kg is not None:
+                cur.execute("""
+                    INSERT INTO weights(rabbit_id, weigh_date, weight_kg)
+                    VALUES (?, ?, ?)
+                """, (cur.lastrowid, date.today().strftime("%Y-%m-%d"), weight_kg))
+        invalidate_rabbit_cache()
 
         # === Achievements: rabbit counts ===
         cur.execute("SELECT COUNT(*) AS c FROM rabbits")
@@ -275,37 +467,77 @@ def add_rabbit(name, sex):
         conn.close()
 
 
+# list_rabbits_formatted() results by (row_format, active_only), as
+# (monotonic time, rows). Every write to the rabbits table calls
+# invalidate_rabbit_cache(); the short TTL only guards against writes made
+# outside the bot.
+RABBIT_LIST_CACHE = {}
+RABBIT_LIST_TTL = 1.0
+
+# Bumped by invalidate_rabbit_cache() and part of get_rabbit's cache key, so
+# a row read by a worker thread before a write lands under the old
+# generation and is never served after it, even if stored after the clear.
+_rabbit_generation = 0
+
+
+def invalidate_rabbit_cache():
+    """Forget cached rabbit rows (roster listings and get_rabbit lookups)."""
+    global _rabbit_generation
+    _rabbit_generation += 1
+    RABBIT_LIST_CACHE.clear()
+    _get_rabbit_cached.cache_clear()
+
+
+def list_rabbits_formatted(row_format, active_only=False):
+    """
+    All rabbits (or only active ones) by name, each already rendered by
+    SQLite's printf(row_format, name, sex, cage, section, status), with
+    missing cage/section shown as "—" and a NULL status as "None", as the
+    Python formatting this replaced did.
+    """
+    key = (row_format, active_only)
+    cached = RABBIT_LIST_CACHE.get(key)
+    if cached is not None and monotonic() - cached[0] < RABBIT_LIST_TTL:
+        return cached[1]
 
-def list_rabbits(active_only=False):
+    where = "WHERE status='active' " if active_only else ""
     conn = get_db()
     cur = conn.cursor()
-    if active_only:
-        cur.execute("SELECT * FROM rabbits WHERE status='active' ORDER BY name")
-    else:
-        cur.execute("SELECT * FROM rabbits ORDER BY name")
-    rows = cur.fetchall()
+    cur.row_factory = None
+    cur.execute(f"""
+        SELECT printf(?, name, sex,
+                      COALESCE(NULLIF(cage, ''), '—'),
+                      COALESCE(NULLIF(section, ''), '—'),
+                      COALESCE(status, 'None'))
+        FROM rabbits {where}ORDER BY name
+    """, (row_format,))
+    rows = [r[0] for r in cur.fetchall()]
     conn.close()
+    RABBIT_LIST_CACHE[key] = (monotonic(), rows)
     return rows
 
 
+# Most commands look rabbits up by name, often several times per command;
+# rows are cached until the next write to the rabbits table.
 def get_rabbit(name):
-    conn = get_db()
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM rabbits WHERE name = ?", (name,))
-    row = cur.fetchone()
-    conn.close()
-    return row
+    return _get_rabbit_cached(name, _rabbit_generation)
+
+
+@functools.lru_cache(maxsize=1024)
+def _get_rabbit_cached(name, generation):
+    with db_session() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT * FROM rabbits WHERE name = ?", (name,))
+        return cur.fetchone()
 
 
 def get_rabbit_by_id(rid):
     if rid is None:
         return None
-    conn = get_db()
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM rabbits WHERE id = ?", (rid,))
-    row = cur.fetchone()
-    conn.close()
-    return row
+    with db_session() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT * FROM rabbits WHERE id = ?", (rid,))
+        return cur.fetchone()
 
 
 def update_rabbit_parents(child_name, mother_name, father_name):
@@ -322,6 +554,7 @@ def update_rabbit_parents(child_name, mother_name, father_name):
         UPDATE rabbits SET mother_id=?, father_id=? WHERE id=?
     """, (mother["id"], father["id"], child["id"]))
     conn.commit()
+    invalidate_rabbit_cache()
     conn.close()
     return f"✅ Parents set for {child_name}: mother {mother_name}, father {father_name}."
 
@@ -336,6 +569,7 @@ def set_cage_section(name, cage, section=None):
         UPDATE rabbits SET cage=?, section=? WHERE id=?
     """, (cage, section, r["id"]))
     conn.commit()
+    invalidate_rabbit_cache()
     conn.close()
     msg = f"✅ {name} assigned to cage {cage}"
     if section:
@@ -354,6 +588,7 @@ def mark_dead(name, reason=None):
         UPDATE rabbits SET status='dead', death_date=?, death_reason=? WHERE id=?
     """, (today_str, reason, r["id"]))
     conn.commit()
+    invalidate_rabbit_cache()
     conn.close()
     return f"☠️ {name} marked as dead." + (f" Reason: {reason}" if reason else "")
 
@@ -381,6 +616,7 @@ def delete_rabbit_completely(rabbit_id: int):
     cur.execute("DELETE FROM rabbits WHERE id=?", (rabbit_id,))
 
     conn.commit()
+    invalidate_rabbit_cache()
     conn.close()
 
 
@@ -459,6 +695,43 @@ def assess_inbreeding(name1, name2):
     return "none", "✅ No close relation found (parents/grandparents)."
 
 
+def build_ancestor_sets(cur):
+    """
+    Load the pedigree once and return {id: (parent_ids, grandparent_ids)}
+    as frozensets, so many pairs can be checked without extra queries.
+    """
+    cur.execute("SELECT id, mother_id, father_id FROM rabbits")
+    parents = {
+        row["id"]: frozenset(x for x in (row["mother_id"], row["father_id"]) if x)
+        for row in cur.fetchall()
+    }
+    ancestors = {}
+    for rid, ps in parents.items():
+        gps = set()
+        for pid in ps:
+            gps |= parents.get(pid, frozenset())
+        ancestors[rid] = (ps, frozenset(gps))
+    return ancestors
+
+
+def inbreeding_severity(id1, id2, ancestors):
+    """Severity-only version of assess_inbreeding using build_ancestor_sets()."""
+    if id1 == id2:
+        return "error"
+    parents1, gp1 = ancestors[id1]
+    parents2, gp2 = ancestors[id2]
+
+    # Parent–offspring, or shared parents = siblings (full or half)
+    if id1 in parents2 or id2 in parents1 or parents1 & parents2:
+        return "danger"
+
+    # Grandparents (cousin-level)
+    if gp1 & gp2:
+        return "warning"
+
+    return "none"
+
+
 def checkpair_inbreeding(name1, name2):
     """Keeps old interface for /checkpair, just returns the message."""
     _, msg = assess_inbreeding(name1, name2)
@@ -476,6 +749,7 @@ def set_rabbit_photo(name: str, file_id: str):
     cur = conn.cursor()
     cur.execute("UPDATE rabbits SET photo_file_id=? WHERE id=?", (file_id, r["id"]))
     conn.commit()
+    invalidate_rabbit_cache()
     conn.close()
     return True, f"✅ Photo saved for {name}."
 
@@ -579,35 +853,17 @@ def record_kindling(doe_name, litter_size, litter_name=None):
     return msg
 
 
-
-def get_due_today():
-    today = date.today().strftime("%Y-%m-%d")
-    conn = get_db()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT r.name
-        FROM breedings b
-        JOIN rabbits r ON r.id=b.doe_id
-        WHERE b.expected_due_date=?
-    """, (today,))
-    rows = cur.fetchall()
-    conn.close()
-    return rows
-
-
 def get_weaning_today():
     today = date.today().strftime("%Y-%m-%d")
-    conn = get_db()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT r.name
-        FROM breedings b
-        JOIN rabbits r ON r.id=b.doe_id
-        WHERE b.weaning_date=?
-    """, (today,))
-    rows = cur.fetchall()
-    conn.close()
-    return rows
+    with db_session() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT r.name
+            FROM breedings b
+            JOIN rabbits r ON r.id=b.doe_id
+            WHERE b.weaning_date=?
+        """, (today,))
+        return cur.fetchall()
 
 
 def get_litters_for_doe(doe_name):
@@ -662,17 +918,15 @@ def get_next_due_for_doe(doe_name):
     doe = get_rabbit(doe_name)
     if not doe:
         return None
-    conn = get_db()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT * FROM breedings
-        WHERE doe_id=? AND kindling_date IS NULL
-        ORDER BY DATE(expected_due_date) ASC
-        LIMIT 1
-    """, (doe["id"],))
-    row = cur.fetchone()
-    conn.close()
-    return row
+    with db_session() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT * FROM breedings
+            WHERE doe_id=? AND kindling_date IS NULL
+            ORDER BY DATE(expected_due_date) ASC
+            LIMIT 1
+        """, (doe["id"],))
+        return cur.fetchone()
 
 
 # ================== HEALTH, WEIGHTS, SALES ==================
@@ -725,6 +979,7 @@ def record_sale(name, price, buyer):
     """, (rabbit["id"], today_str, price, buyer))
     cur.execute("UPDATE rabbits SET status='sold' WHERE id=?", (rabbit["id"],))
     conn.commit()
+    invalidate_rabbit_cache()
     conn.close()
 
     # === Achievements: sales & profit ===
@@ -759,21 +1014,19 @@ def add_weight(name, weight_kg):
 
 
 def get_weight_log(name, limit=5):
-    rabbit = get_rabbit(name)
-    if not rabbit:
-        return None, []
-    conn = get_db()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT weigh_date, weight_kg
-        FROM weights
-        WHERE rabbit_id = ?
-        ORDER BY weigh_date DESC, id DESC
-        LIMIT ?
-    """, (rabbit["id"], limit))
-    rows = cur.fetchall()
-    conn.close()
-    return rabbit, rows
+    with db_session() as conn:
+        rabbit = get_rabbit(name)
+        if not rabbit:
+            return None, []
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT weigh_date, weight_kg
+            FROM weights
+            WHERE rabbit_id = ?
+            ORDER BY weigh_date DESC, id DESC
+            LIMIT ?
+        """, (rabbit["id"], limit))
+        return rabbit, cur.fetchall()
 
 
 # ================== EXPENSES, FEED, PROFIT ==================
@@ -805,9 +1058,6 @@ def add_feed(amount_kg, cost, note=None):
 
 
 def get_profit_summary(period=None):
-    conn = get_db()
-    cur = conn.cursor()
-
     sales_where = ""
     exp_where = ""
     params_sales = []
@@ -828,20 +1078,18 @@ def get_profit_summary(period=None):
         params_sales = [like]
         params_exp = [like]
 
-    cur.execute(f"SELECT COALESCE(SUM(price),0) AS s FROM sales {sales_where}", params_sales)
-    income = cur.fetchone()["s"]
+    with db_session() as conn:
+        cur = conn.cursor()
+        cur.execute(f"SELECT COALESCE(SUM(price),0) AS s FROM sales {sales_where}", params_sales)
+        income = cur.fetchone()["s"]
 
-    cur.execute(f"SELECT COALESCE(SUM(amount),0) AS e FROM expenses {exp_where}", params_exp)
-    expenses = cur.fetchone()["e"]
+        cur.execute(f"SELECT COALESCE(SUM(amount),0) AS e FROM expenses {exp_where}", params_exp)
+        expenses = cur.fetchone()["e"]
 
-    conn.close()
     return income, expenses, income - expenses
 
 
 def get_feed_stats(period=None):
-    conn = get_db()
-    cur = conn.cursor()
-
     where = ""
     params = []
 
@@ -854,12 +1102,13 @@ def get_feed_stats(period=None):
         where = "WHERE log_date LIKE ?"
         params = [period + "%"]
 
-    cur.execute(f"""
-        SELECT COALESCE(SUM(amount_kg),0) AS kg, COALESCE(SUM(cost),0) AS c
-        FROM feed_logs {where}
-    """, params)
-    row = cur.fetchone()
-    conn.close()
+    with db_session() as conn:
+        cur = conn.cursor()
+        cur.execute(f"""
+            SELECT COALESCE(SUM(amount_kg),0) AS kg, COALESCE(SUM(cost),0) AS c
+            FROM feed_logs {where}
+        """, params)
+        row = cur.fetchone()
     return row["kg"], row["c"]
 
 
@@ -877,33 +1126,50 @@ def add_task(task_date_str, title, note=None):
     return "✅ Task added."
 
 
-def get_tasks_for_date(d):
+def get_daily_bundle(d):
+    """
+    Kindlings due, weanings and open tasks for date d in one query, as
+    (dues, weans, tasks) lists of rows. Each row has kind, id, name,
+    task_date, title and note; name is set for dues/weans, the rest for tasks.
+    """
     ds = d.strftime("%Y-%m-%d")
-    conn = get_db()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT * FROM tasks
-        WHERE task_date=? AND done=0
-        ORDER BY id
-    """, (ds,))
-    rows = cur.fetchall()
-    conn.close()
-    return rows
-
-
-def get_upcoming_tasks(limit=10):
+    with db_session() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT 'due' AS kind, b.id AS id, r.name AS name,
+                   NULL AS task_date, NULL AS title, NULL AS note
+            FROM breedings b
+            JOIN rabbits r ON r.id=b.doe_id
+            WHERE b.expected_due_date=?
+            UNION ALL
+            SELECT 'wean', b.id, r.name, NULL, NULL, NULL
+            FROM breedings b
+            JOIN rabbits r ON r.id=b.doe_id
+            WHERE b.weaning_date=?
+            UNION ALL
+            SELECT 'task', id, NULL, task_date, title, note
+            FROM tasks
+            WHERE task_date=? AND done=0
+            ORDER BY kind, id
+        """, (ds, ds, ds))
+        rows = cur.fetchall()
+    bundle = {"due": [], "wean": [], "task": []}
+    for row in rows:
+        bundle[row["kind"]].append(row)
+    return bundle["due"], bundle["wean"], bundle["task"]
+
+
+def get_upcoming_tasks(limit=10, offset=0):
     today_str = date.today().strftime("%Y-%m-%d")
-    conn = get_db()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT * FROM tasks
-        WHERE task_date>=? AND done=0
-        ORDER BY task_date, id
-        LIMIT ?
-    """, (today_str, limit))
-    rows = cur.fetchall()
-    conn.close()
-    return rows
+    with db_session() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT * FROM tasks
+            WHERE task_date>=? AND done=0
+            ORDER BY task_date, id
+            LIMIT ? OFFSET ?
+        """, (today_str, limit, offset))
+        return cur.fetchall()
 
 
 def mark_task_done(task_id):
@@ -918,6 +1184,7 @@ def mark_task_done(task_id):
 
 # ================== STATS & INFO ==================
 
+@ttl_cache(60)
 def get_stats_message():
     conn = get_db()
     cur = conn.cursor()
@@ -1044,6 +1311,7 @@ def get_info_message(name):
 
 
 
+@ttl_cache(60)
 def get_farmsummary_message():
     stats = get_stats_message()
     income_all, exp_all, prof_all = get_profit_summary(None)
@@ -1061,17 +1329,47 @@ def get_farmsummary_message():
 
 # ================== ADVANCED ANALYTICS & UTILITIES ==================
 
+def fetch_rabbits_by_ids(cur, ids):
+    """Load several rabbits in one query. Returns {id: row}."""
+    ids = list({i for i in ids if i})
+    if not ids:
+        return {}
+    placeholders = ",".join("?" * len(ids))
+    cur.execute(f"SELECT * FROM rabbits WHERE id IN ({placeholders})", ids)
+    return {row["id"]: row for row in cur.fetchall()}
+
+
+@ttl_cache(60)
 def build_family_tree(name: str) -> str:
     """Return a small text family tree for a rabbit."""
-    r = get_rabbit(name)
-    if not r:
-        return "❌ Rabbit not found."
+    with db_session() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT * FROM rabbits WHERE name = ?", (name,))
+        r = cur.fetchone()
+        if not r:
+            return "❌ Rabbit not found."
+
+        # Parents (one query), then grandparents (one query)
+        parents = fetch_rabbits_by_ids(cur, [r["mother_id"], r["father_id"]])
+        mother = parents.get(r["mother_id"])
+        father = parents.get(r["father_id"])
+        grand = fetch_rabbits_by_ids(
+            cur,
+            [p[k] for p in (mother, father) if p for k in ("mother_id", "father_id")],
+        )
+
+        # Children (direct)
+        # Two single-column lookups so each can use its index (OR forces a scan)
+        cur.execute("""
+            SELECT name, sex FROM rabbits WHERE mother_id=?
+            UNION
+            SELECT name, sex FROM rabbits WHERE father_id=?
+            ORDER BY name
+        """, (r["id"], r["id"]))
+        children = cur.fetchall()
 
     lines = [f"👨‍👩‍👧 Family tree for {r['name']} ({r['sex']})"]
 
-    # Parents
-    mother = get_rabbit_by_id(r["mother_id"])
-    father = get_rabbit_by_id(r["father_id"])
     if mother or father:
         m = mother["name"] if mother else "unknown"
         f = father["name"] if father else "unknown"
@@ -1083,8 +1381,8 @@ def build_family_tree(name: str) -> str:
     def parent_names(p):
         if not p:
             return "unknown"
-        gm = get_rabbit_by_id(p["mother_id"])
-        gf = get_rabbit_by_id(p["father_id"])
+        gm = grand.get(p["mother_id"])
+        gf = grand.get(p["father_id"])
         gm_name = gm["name"] if gm else "unknown"
         gf_name = gf["name"] if gf else "unknown"
         return f"{gm_name} × {gf_name}"
@@ -1096,17 +1394,6 @@ def build_family_tree(name: str) -> str:
         if father:
             lines.append(f"  Paternal: {parent_names(father)}")
 
-    # Children (direct)
-    conn = get_db()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT name, sex FROM rabbits
-        WHERE mother_id=? OR father_id=?
-        ORDER BY name
-    """, (r["id"], r["id"]))
-    children = cur.fetchall()
-    conn.close()
-
     if children:
         lines.append("Children:")
         for c in children:
@@ -1117,6 +1404,23 @@ def build_family_tree(name: str) -> str:
     return "\n".join(lines)
 
 
+def parse_weight_records(records):
+    """Turn weight rows into [(date, kg), ...], skipping unparsable dates."""
+    data = []
+    for r in records:
+        s = r["weigh_date"]
+        try:
+            # fast path for the YYYY-MM-DD dates the bot writes
+            d = date.fromisoformat(s)
+        except (TypeError, ValueError):
+            try:
+                d = datetime.fromisoformat(s).date()
+            except Exception:
+                continue
+        data.append((d, float(r["weight_kg"])))
+    return data
+
+
 def compute_growth_message(name: str) -> str:
     """Use weight log to compute average daily gain."""
     rabbit, rows = get_weight_log(name, limit=1000)
@@ -1126,14 +1430,7 @@ def compute_growth_message(name: str) -> str:
         return f"Not enough weight records for {name} (need at least 2)."
 
     # rows are ordered by weigh_date DESC, so reverse
-    records = list(reversed(rows))
-    data = []
-    for r in records:
-        try:
-            d = datetime.fromisoformat(r["weigh_date"]).date()
-        except Exception:
-            continue
-        data.append((d, float(r["weight_kg"])))
+    data = parse_weight_records(reversed(rows))
 
     if len(data) < 2:
         return f"Not enough valid weight records for {name}."
@@ -1162,6 +1459,10 @@ def compute_growth_message(name: str) -> str:
     return "\n".join(msg)
 
 
+GROWTH_CHART_MAX_BLOCKS = 10
+GROWTH_CHART_BARS = ["▇" * i for i in range(GROWTH_CHART_MAX_BLOCKS + 1)]
+
+
 def build_growth_chart_ascii(name: str) -> str:
     """Return ASCII chart of weights over time."""
     rabbit, rows = get_weight_log(name, limit=50)
@@ -1170,14 +1471,7 @@ def build_growth_chart_ascii(name: str) -> str:
     if len(rows) < 2:
         return f"Not enough weight records for {name} (need at least 2)."
 
-    records = list(reversed(rows))
-    data = []
-    for r in records:
-        try:
-            d = datetime.fromisoformat(r["weigh_date"]).date()
-        except Exception:
-            continue
-        data.append((d, float(r["weight_kg"])))
+    data = parse_weight_records(reversed(rows))
     if len(data) < 2:
         return f"Not enough valid weight records for {name}."
 
@@ -1192,32 +1486,21 @@ def build_growth_chart_ascii(name: str) -> str:
         return "\n".join(lines)
 
     lines = [f"📊 Growth chart for {rabbit['name']}: (ASCII)"]
-    max_blocks = 10
+    span = max_w - min_w
     for d, w in data:
-        rel = (w - min_w) / (max_w - min_w)
-        blocks = int(round(rel * max_blocks))
-        blocks = max(1, blocks)
-        bar = "▇" * blocks
-        lines.append(f"{d}: {w:.3f} kg | {bar}")
+        blocks = max(1, int(round((w - min_w) / span * GROWTH_CHART_MAX_BLOCKS)))
+        lines.append(f"{d}: {w:.3f} kg | {GROWTH_CHART_BARS[blocks]}")
 
     lines.append(f"\nMin: {min_w:.3f} kg, Max: {max_w:.3f} kg")
     return "\n".join(lines)
 
 
-def get_growth_stats(name: str):
-    """Return (has_data, daily_grams, days, gain_kg) for internal decisions."""
-    rabbit, rows = get_weight_log(name, limit=1000)
-    if not rabbit or len(rows) < 2:
-        return False, None, None, None
-
-    records = list(reversed(rows))
-    data = []
-    for r in records:
-        try:
-            d = datetime.fromisoformat(r["weigh_date"]).date()
-        except Exception:
-            continue
-        data.append((d, float(r["weight_kg"])))
+def growth_stats_from_records(records):
+    """
+    Compute (has_data, daily_grams, days, gain_kg) from weight rows
+    ordered oldest first.
+    """
+    data = parse_weight_records(records)
     if len(data) < 2:
         return False, None, None, None
 
@@ -1232,30 +1515,70 @@ def get_growth_stats(name: str):
     return True, daily, days, gain
 
 
-def export_table_to_csv(query: str, params, headers, filename_prefix: str) -> str | None:
+def get_growth_stats_bulk(rabbit_ids, limit=1000):
     """
-    Run SQL and write results as CSV to a temporary file.
-    Returns the full file path or None if no rows.
+    Growth stats for many rabbits with a single query, for internal
+    decisions. Returns {rabbit_id: (has_data, daily_grams, days, gain_kg)}.
+    """
+    ids = list(rabbit_ids)
+    stats = {rid: (False, None, None, None) for rid in ids}
+    if not ids:
+        return stats
+
+    placeholders = ",".join("?" * len(ids))
+    by_rabbit = {}
+    with db_session() as conn:
+        cur = conn.cursor()
+        cur.execute(f"""
+            SELECT rabbit_id, weigh_date, weight_kg
+            FROM weights
+            WHERE rabbit_id IN ({placeholders})
+            ORDER BY rabbit_id, weigh_date, id
+        """, ids)
+        for row in cur.fetchall():
+            by_rabbit.setdefault(row["rabbit_id"], []).append(row)
+
+    for rid, records in by_rabbit.items():
+        # keep the same window as get_weight_log(limit=...)
+        stats[rid] = growth_stats_from_records(records[-limit:])
+    return stats
+
+
+def write_query_csv(conn, query: str, params, headers, out) -> bool:
+    """
+    Run SQL and write the results as CSV to the text stream out.
+    Returns False (without writing anything) if no rows.
     """
-    conn = get_db()
     cur = conn.cursor()
+    cur.row_factory = None  # plain tuples; columns are resolved by index below
+    cur.arraysize = 1000
     cur.execute(query, params or [])
-    rows = cur.fetchall()
-    conn.close()
 
-    if not rows:
-        return None
+    first = next(cur, None)
+    if first is None:
+        return False
+
+    columns = {d[0]: i for i, d in enumerate(cur.description)}
+    idx = [columns[h] for h in headers]
 
-    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=f"_{filename_prefix}.csv")
-    tmp_path = tmp.name
+    writer = csv.writer(out)
+    writer.writerow(headers)
+    writer.writerow([first[i] for i in idx])
+    while batch := cur.fetchmany():
+        writer.writerows([row[i] for i in idx] for row in batch)
+    return True
 
-    with open(tmp_path, "w", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
-        writer.writerow(headers)
-        for row in rows:
-            writer.writerow([row[h] for h in headers])
 
-    return tmp_path
+def export_table_to_bytes(query: str, params, headers) -> bytes | None:
+    """
+    Run SQL and return the results as UTF-8 CSV bytes, or None if no rows.
+    Farm tables are small enough to build in memory, so no temp file.
+    """
+    buf = io.StringIO(newline="")
+    with db_session() as conn:
+        if not write_query_csv(conn, query, params, headers, buf):
+            return None
+    return buf.getvalue().encode("utf-8")
 
 
 def get_backup_db_path() -> str | None:
@@ -1265,59 +1588,57 @@ def get_backup_db_path() -> str | None:
     return None
 
 
-def get_line_performance_message(name: str) -> str:
-    """Basic line performance: litters, kits, survival, income from offspring."""
-    r = get_rabbit(name)
-    if not r:
-        return "❌ Rabbit not found."
-
+def get_db_snapshot() -> bytes:
+    """
+    Return a consistent copy of the whole database as bytes. Unlike reading
+    rabbits.db directly, this includes changes still in the WAL file.
+    """
     conn = get_db()
-    cur = conn.cursor()
-
-    if r["sex"] == "F":
-        # Doe line: based on her breedings and children as mother
-        cur.execute("""
-            SELECT COUNT(*) AS c, COALESCE(SUM(litter_size),0) AS s
-            FROM breedings
-            WHERE doe_id=?
-        """, (r["id"],))
-        br = cur.fetchone()
-        litters = br["c"]
-        total_kits_recorded = int(br["s"] or 0)
+    try:
+        return conn.serialize()
+    finally:
+        conn.close()
 
-        cur.execute("SELECT COUNT(*) AS c FROM rabbits WHERE mother_id=?", (r["id"],))
-        kits_alive = cur.fetchone()["c"]
 
-        cur.execute("""
-            SELECT COALESCE(SUM(s.price),0) AS income
-            FROM rabbits k
-            JOIN sales s ON s.rabbit_id = k.id
-            WHERE k.mother_id=?
-        """, (r["id"],))
-        income = cur.fetchone()["income"]
+def fetch_line_stats(cur, r, kindled_only=False):
+    """
+    Return (litters, kits_recorded, kits_alive, income) for a doe or buck
+    line in a single round trip.
+    """
+    if r["sex"] == "F":
+        breeder_col, parent_col = "doe_id", "mother_id"
     else:
-        # Buck line: based on breedings with him and children as father
-        cur.execute("""
-            SELECT COUNT(*) AS c, COALESCE(SUM(litter_size),0) AS s
-            FROM breedings
-            WHERE buck_id=?
-        """, (r["id"],))
-        br = cur.fetchone()
-        litters = br["c"]
-        total_kits_recorded = int(br["s"] or 0)
+        breeder_col, parent_col = "buck_id", "father_id"
+    kindled = " AND kindling_date IS NOT NULL" if kindled_only else ""
 
-        cur.execute("SELECT COUNT(*) AS c FROM rabbits WHERE father_id=?", (r["id"],))
-        kits_alive = cur.fetchone()["c"]
+    cur.execute(f"""
+        SELECT
+            (SELECT COUNT(*) FROM breedings
+             WHERE {breeder_col}=?{kindled}) AS litters,
+            (SELECT COALESCE(SUM(litter_size),0) FROM breedings
+             WHERE {breeder_col}=?{kindled}) AS kits,
+            (SELECT COUNT(*) FROM rabbits
+             WHERE {parent_col}=?) AS alive,
+            (SELECT COALESCE(SUM(s.price),0)
+             FROM rabbits k
+             JOIN sales s ON s.rabbit_id = k.id
+             WHERE k.{parent_col}=?) AS income
+    """, (r["id"],) * 4)
+    row = cur.fetchone()
+    return row["litters"], int(row["kits"] or 0), row["alive"], row["income"]
 
-        cur.execute("""
-            SELECT COALESCE(SUM(s.price),0) AS income
-            FROM rabbits k
-            JOIN sales s ON s.rabbit_id = k.id
-            WHERE k.father_id=?
-        """, (r["id"],))
-        income = cur.fetchone()["income"]
 
-    conn.close()
+@ttl_cache(60)
+def get_line_performance_message(name: str) -> str:
+    """Basic line performance: litters, kits, survival, income from offspring."""
+    with db_session() as conn:
+        r = get_rabbit(name)
+        if not r:
+            return "❌ Rabbit not found."
+
+        # Doe line: her breedings and children as mother;
+        # buck line: breedings with him and children as father.
+        litters, total_kits_recorded, kits_alive, income = fetch_line_stats(conn.cursor(), r)
 
     avg_litter = (total_kits_recorded / litters) if litters > 0 else 0
     survival_rate = (kits_alive / total_kits_recorded * 100) if total_kits_recorded > 0 else None
@@ -1346,56 +1667,27 @@ def get_line_performance_message(name: str) -> str:
     return "\n".join(lines)
 
 
+@ttl_cache(60)
 def decide_keep_or_sell(name: str) -> str:
     """Heuristic suggestion to keep as breeder or sell."""
-    r = get_rabbit(name)
-    if not r:
-        return "❌ Rabbit not found."
-
-    has_growth, daily_g, days, gain = get_growth_stats(name)
-
-    conn = get_db()
-    cur = conn.cursor()
-
-    if r["sex"] == "F":
-        # Doe: look at litters & survival & income
-        cur.execute("""
-            SELECT COUNT(*) AS c, COALESCE(SUM(litter_size),0) AS s
-            FROM breedings
-            WHERE doe_id=? AND kindling_date IS NOT NULL
-        """, (r["id"],))
-        br = cur.fetchone()
-        litters = br["c"]
-        total_kits_recorded = int(br["s"] or 0)
-
-        cur.execute("SELECT COUNT(*) AS c FROM rabbits WHERE mother_id=?", (r["id"],))
-        kits_alive = cur.fetchone()["c"]
-
-        cur.execute("""
-            SELECT COALESCE(SUM(s.price),0) AS income
-            FROM rabbits k
-            JOIN sales s ON s.rabbit_id = k.id
-            WHERE k.mother_id=?
-        """, (r["id"],))
-        income = cur.fetchone()["income"]
-    else:
-        # Buck: children count and income
-        cur.execute("SELECT COUNT(*) AS c FROM rabbits WHERE father_id=?", (r["id"],))
-        kits_alive = cur.fetchone()["c"]
+    with db_session() as conn:
+        r = get_rabbit(name)
+        if not r:
+            return "❌ Rabbit not found."
+
+        # Doe: litters & survival & income; buck: children count and income
+        litters, total_kits_recorded, kits_alive, income = fetch_line_stats(
+            conn.cursor(), r, kindled_only=True
+        )
 
-        cur.execute("""
-            SELECT COALESCE(SUM(s.price),0) AS income
-            FROM rabbits k
-            JOIN sales s ON s.rabbit_id = k.id
-            WHERE k.father_id=?
-        """, (r["id"],))
-        income = cur.fetchone()["income"]
+        # Growth is always shown in the report; look it up by id so the
+        # rabbit isn't fetched a second time by name.
+        has_growth, daily_g, days, gain = get_growth_stats_bulk([r["id"]])[r["id"]]
 
+    if r["sex"] != "F":
         litters = None
         total_kits_recorded = None
 
-    conn.close()
-
     lines = [f"🧠 Keep or sell analysis for {r['name']} ({r['sex']}):"]
 
     if has_growth:
@@ -1437,88 +1729,95 @@ def decide_keep_or_sell(name: str) -> str:
 
 def suggest_breeding_pairs(limit: int = 5):
     """Return a list of suggested doe-buck pairs with a score."""
-    conn = get_db()
-    cur = conn.cursor()
-
-    cur.execute("SELECT * FROM rabbits WHERE sex='F' AND status='active' ORDER BY name")
-    does = cur.fetchall()
-    cur.execute("SELECT * FROM rabbits WHERE sex='M' AND status='active' ORDER BY name")
-    bucks = cur.fetchall()
+    with db_session() as conn:
+        cur = conn.cursor()
 
-    if not does or not bucks:
-        conn.close()
-        return []
+        cur.execute("SELECT * FROM rabbits WHERE sex='F' AND status='active' ORDER BY name")
+        does = cur.fetchall()
+        cur.execute("SELECT * FROM rabbits WHERE sex='M' AND status='active' ORDER BY name")
+        bucks = cur.fetchall()
 
-    results = []
+        if not does or not bucks:
+            return []
 
-    for d in does:
-        # doe stats
+        # doe stats and buck offspring counts, one query each
         cur.execute("""
-            SELECT COUNT(*) AS c, COALESCE(SUM(litter_size),0) AS s
+            SELECT doe_id, COUNT(*) AS c, COALESCE(SUM(litter_size),0) AS s
             FROM breedings
-            WHERE doe_id=? AND kindling_date IS NOT NULL
-        """, (d["id"],))
-        br = cur.fetchone()
-        litters = br["c"]
-        total_kits = int(br["s"] or 0)
-        avg_litter = (total_kits / litters) if litters > 0 else 0
-        has_g, daily_g, _, _ = get_growth_stats(d["name"])
-
-        for b in bucks:
-            severity, _ = assess_inbreeding(d["name"], b["name"])
-            if severity == "danger":
-                continue  # skip
-
-            score = 0.0
-            # inbreeding safety
-            if severity == "none":
-                score += 5.0
-            elif severity == "warning":
-                score += 1.0
-
-            # doe productivity
-            score += avg_litter * 2.0
-            score += litters * 1.0
-
-            if has_g and daily_g:
-                score += daily_g / 10.0  # small boost for better growth
-
-            # buck: number of children in DB
-            cur.execute("SELECT COUNT(*) AS c FROM rabbits WHERE father_id=?", (b["id"],))
-            off = cur.fetchone()["c"]
-            score += off * 0.3
-
-            results.append((score, d["name"], b["name"], severity))
+            WHERE kindling_date IS NOT NULL
+            GROUP BY doe_id
+        """)
+        doe_stats = {row["doe_id"]: (row["c"], row["s"]) for row in cur.fetchall()}
 
-    conn.close()
+        cur.execute("""
+            SELECT father_id, COUNT(*) AS c
+            FROM rabbits
+            WHERE father_id IS NOT NULL
+            GROUP BY father_id
+        """)
+        buck_children = {row["father_id"]: row["c"] for row in cur.fetchall()}
 
-    results.sort(key=lambda x: x[0], reverse=True)
-    return results[:limit]
+        ancestors = build_ancestor_sets(cur)
+        growth = get_growth_stats_bulk(d["id"] for d in does)
 
+    def scored_pairs():
+        for d in does:
+            # doe stats
+            litters, total_kits = doe_stats.get(d["id"], (0, 0))
+            total_kits = int(total_kits or 0)
+            avg_litter = (total_kits / litters) if litters > 0 else 0
+            has_g, daily_g, _, _ = growth[d["id"]]
 
-def compute_achievements():
-    """Calculate unlocked achievements based on farm data."""
-    conn = get_db()
-    cur = conn.cursor()
+            for b in bucks:
+                severity = inbreeding_severity(d["id"], b["id"], ancestors)
+                if severity == "danger":
+                    continue  # skip
 
-    # Litters & kits
-    cur.execute("SELECT COUNT(*) AS c FROM breedings WHERE kindling_date IS NOT NULL")
-    litters = cur.fetchone()["c"]
+                score = 0.0
+                # inbreeding safety
+                if severity == "none":
+                    score += 5.0
+                elif severity == "warning":
+                    score += 1.0
 
-    cur.execute("SELECT COALESCE(SUM(litter_size),0) AS s FROM breedings WHERE litter_size IS NOT NULL")
-    total_kits = int(cur.fetchone()["s"] or 0)
+                # doe productivity
+                score += avg_litter * 2.0
+                score += litters * 1.0
 
-    # Rabbits & sales
-    cur.execute("SELECT COUNT(*) AS c FROM rabbits")
-    rabbits = cur.fetchone()["c"]
+                if has_g and daily_g:
+                    score += daily_g / 10.0  # small boost for better growth
 
-    cur.execute("SELECT COUNT(*) AS c FROM sales")
-    sales = cur.fetchone()["c"]
+                # buck: number of children in DB
+                off = buck_children.get(b["id"], 0)
+                score += off * 0.3
 
-    income, expenses, profit = get_profit_summary(None)
-    feed_kg, feed_cost = get_feed_stats(None)
+                yield score, d["name"], b["name"], severity
 
-    conn.close()
+    return heapq.nlargest(limit, scored_pairs(), key=lambda x: x[0])
+
+
+def compute_achievements():
+    """Calculate unlocked achievements based on farm data."""
+    with db_session() as conn:
+        cur = conn.cursor()
+
+        # Litters & kits, rabbits & sales
+        cur.execute("""
+            SELECT
+                (SELECT COUNT(*) FROM breedings WHERE kindling_date IS NOT NULL) AS litters,
+                (SELECT COALESCE(SUM(litter_size),0) FROM breedings WHERE litter_size IS NOT NULL) AS kits,
+                (SELECT COUNT(*) FROM rabbits) AS rabbits,
+                (SELECT COUNT(*) FROM sales) AS sales
+        """)
+        row = cur.fetchone()
+
+        income, expenses, profit = get_profit_summary(None)
+        feed_kg, feed_cost = get_feed_stats(None)
+
+    litters = row["litters"]
+    total_kits = int(row["kits"] or 0)
+    rabbits = row["rabbits"]
+    sales = row["sales"]
 
     achievements = []
 
@@ -1606,12 +1905,9 @@ def get_climate_warning_short():
 
 # ================== ADD-RABBIT WIZARD ==================
 
+@owner_required
 async def addrabbit_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Start interactive rabbit creation."""
-    # make sure only you can use it
-    if not await ensure_owner(update, context):
-        return ConversationHandler.END
-
     context.user_data["new_rabbit"] = {}
     await update.message.reply_text(
         "🐰 Let's add a new rabbit.\n\n"
@@ -1622,9 +1918,6 @@ async def addrabbit_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 async def addrabbit_name(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not await ensure_owner(update, context):
-        return ConversationHandler.END
-
     name = update.message.text.strip()
     if not name:
         await update.message.reply_text("Please send a non-empty name 🙂")
@@ -1639,9 +1932,6 @@ async def addrabbit_name(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 async def addrabbit_sex(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not await ensure_owner(update, context):
-        return ConversationHandler.END
-
     sex_raw = update.message.text.strip().upper()
     if sex_raw not in ("M", "F"):
         await update.message.reply_text("Sex must be *M* or *F*. Please type again.", parse_mode="Markdown")
@@ -1673,9 +1963,6 @@ async def addrabbit_sex(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 async def addrabbit_cage(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not await ensure_owner(update, context):
-        return ConversationHandler.END
-
     cage_raw = update.message.text.strip()
     data = context.user_data.get("new_rabbit", {})
     name = data.get("name")
@@ -1702,9 +1989,6 @@ async def addrabbit_cage(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 async def addrabbit_section(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not await ensure_owner(update, context):
-        return ConversationHandler.END
-
     section_raw = update.message.text.strip()
     data = context.user_data.get("new_rabbit", {})
     name = data.get("name")
@@ -1736,9 +2020,6 @@ async def addrabbit_section(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 async def addrabbit_weight(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not await ensure_owner(update, context):
-        return ConversationHandler.END
-
     data = context.user_data.get("new_rabbit", {})
     name = data.get("name")
     sex = data.get("sex")
@@ -1840,83 +2121,81 @@ async def add_rabbit_cage(update: Update, context: ContextTypes.DEFAULT_TYPE):
     return ConversationHandler.END
 
 
-async def start_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not await ensure_owner(update, context):
-        return
+HELP_TEXT = (
+    "🐰 Rabbit Farm Bot\n\n"
+    "Rabbits:\n"
+    "/addrabbit – interactive wizard\n"
+    "/addrabbit_fast NAME M/F – quick add\n"
+    "/rabbits\n"
+    "/cancel – cancel current wizard\n"
+    "/active\n"
+    "/setcage NAME CAGE [SECTION]\n"
+    "/setparents CHILD MOTHER FATHER\n"
+    "/checkpair R1 R2\n"
+    "/markdead NAME [REASON]\n"
+    "\nBreeding & litters:\n"
+    "/breed DOE BUCK\n"
+    "/forcebreed DOE BUCK  (ignore inbreeding warning)\n"
+    "/suggestbreed\n"
+    "/kindling DOE LITTER_SIZE [LITTERNAME]\n"
+    "/litters DOE\n"
+    "/littername DOE LITTERNAME\n"
+    "/nextdue DOE\n"
+    "/today\n"
+    "/weaning\n"
+    "\nHealth & weights:\n"
+    "/health NAME note...\n"
+    "/healthlog NAME\n"
+    "/weight NAME KG\n"
+    "/weightlog NAME\n"
+    "/growth NAME\n"
+    "/growthchart NAME\n"
+    "\nMoney & feed:\n"
+    "/sell NAME PRICE [BUYER]\n"
+    "/expense AMOUNT CATEGORY [NOTE]\n"
+    "/electric AMOUNT [NOTE]\n"
+    "/feed KG COST [NOTE]\n"
+    "/profit\n"
+    "/profitmonth YYYY-MM\n"
+    "/profityear YYYY\n"
+    "/feedstats\n"
+    "/feedmonth YYYY-MM\n"
+    "\nTasks:\n"
+    "/remind YYYY-MM-DD TEXT\n"
+    "/tasklist [PAGE]\n"
+    "/donetask ID\n"
+    "\nInfo & analytics:\n"
+    "/info NAME\n"
+    "/stats\n"
+    "/farmsummary\n"
+    "/tree NAME\n"
+    "/lineperformance NAME\n"
+    "/keep NAME\n"
+    "\nClimate:\n"
+    "/settemp C   (example: /settemp 32)\n"
+    "/climatealert\n"
+    "\nPhotos:\n"
+    "Send a photo with caption = NAME to assign it\n"
+    "/photo NAME (show stored photo)\n"
+    "\nData & backup:\n"
+    "/export_rabbits\n"
+    "/export_breedings\n"
+    "/export_sales\n"
+    "/export_expenses\n"
+    "/backupdb\n"
+    "\nGamified:\n"
+    "/achievements\n"
+    "\nAutomation:\n"
+    "/subscribe\n"
+    "/unsubscribe\n"
+    "\nDebug:\n"
+    "/whoami  (shows your Telegram user ID)"
+)
+
 
+async def start_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # 1) Send the big help text
-    await update.message.reply_text(
-        "🐰 Rabbit Farm Bot\n\n"
-        "Rabbits:\n"
-        "/addrabbit – interactive wizard\n"
-"/addrabbit_fast NAME M/F – quick add\n"
-"/rabbits\n"
-        "/cancel – cancel current wizard\n"
-
-
-        "/active\n"
-        "/setcage NAME CAGE [SECTION]\n"
-        "/setparents CHILD MOTHER FATHER\n"
-        "/checkpair R1 R2\n"
-        "/markdead NAME [REASON]\n"
-        "\nBreeding & litters:\n"
-        "/breed DOE BUCK\n"
-        "/forcebreed DOE BUCK  (ignore inbreeding warning)\n"
-        "/suggestbreed\n"
-        "/kindling DOE LITTER_SIZE [LITTERNAME]\n"
-        "/litters DOE\n"
-        "/littername DOE LITTERNAME\n"
-        "/nextdue DOE\n"
-        "/today\n"
-        "/weaning\n"
-        "\nHealth & weights:\n"
-        "/health NAME note...\n"
-        "/healthlog NAME\n"
-        "/weight NAME KG\n"
-        "/weightlog NAME\n"
-        "/growth NAME\n"
-        "/growthchart NAME\n"
-        "\nMoney & feed:\n"
-        "/sell NAME PRICE [BUYER]\n"
-        "/expense AMOUNT CATEGORY [NOTE]\n"
-        "/electric AMOUNT [NOTE]\n"
-        "/feed KG COST [NOTE]\n"
-        "/profit\n"
-        "/profitmonth YYYY-MM\n"
-        "/profityear YYYY\n"
-        "/feedstats\n"
-        "/feedmonth YYYY-MM\n"
-        "\nTasks:\n"
-        "/remind YYYY-MM-DD TEXT\n"
-        "/tasklist\n"
-        "/donetask ID\n"
-        "\nInfo & analytics:\n"
-        "/info NAME\n"
-        "/stats\n"
-        "/farmsummary\n"
-        "/tree NAME\n"
-        "/lineperformance NAME\n"
-        "/keep NAME\n"
-        "\nClimate:\n"
-        "/settemp C   (example: /settemp 32)\n"
-        "/climatealert\n"
-        "\nPhotos:\n"
-        "Send a photo with caption = NAME to assign it\n"
-        "/photo NAME (show stored photo)\n"
-        "\nData & backup:\n"
-        "/export_rabbits\n"
-        "/export_breedings\n"
-        "/export_sales\n"
-        "/export_expenses\n"
-        "/backupdb\n"
-        "\nGamified:\n"
-        "/achievements\n"
-        "\nAutomation:\n"
-        "/subscribe\n"
-        "/unsubscribe\n"
-        "\nDebug:\n"
-        "/whoami  (shows your Telegram user ID)"
-    )
+    await update.message.reply_text(HELP_TEXT)
 
     # 2) Show the button menu right after the help text
     await menu_cmd(update, context)
@@ -1968,6 +2247,7 @@ MAIN_MENU_TEXT = (
 
 # ---- Main button menu ----
 
+@functools.cache
 def build_main_menu_keyboard() -> InlineKeyboardMarkup:
     """Top-level menu with sections."""
     keyboard = [
@@ -1990,6 +2270,12 @@ def build_main_menu_keyboard() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(keyboard)
 
 
+# Menu keyboards never change at runtime, so every builder is cached
+# (@functools.cache) and each markup is built once.
+MAIN_MENU_MARKUP = build_main_menu_keyboard()
+
+
+@functools.cache
 def build_rabbits_menu_keyboard() -> InlineKeyboardMarkup:
     keyboard = [
         [InlineKeyboardButton("➕ Add rabbit", callback_data="RABBITS_ADD")],
@@ -2002,6 +2288,7 @@ def build_rabbits_menu_keyboard() -> InlineKeyboardMarkup:
 
 
 
+@functools.cache
 def build_breeding_menu_keyboard() -> InlineKeyboardMarkup:
     keyboard = [
         [InlineKeyboardButton("💞 Check pair", callback_data="BREED_CHECKPAIR")],
@@ -2011,6 +2298,7 @@ def build_breeding_menu_keyboard() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(keyboard)
 
 
+@functools.cache
 def build_money_menu_keyboard() -> InlineKeyboardMarkup:
     keyboard = [
         [InlineKeyboardButton("➕ Sale / expense", callback_data="MONEY_HELP")],
@@ -2020,6 +2308,7 @@ def build_money_menu_keyboard() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(keyboard)
 
 
+@functools.cache
 def build_tasks_menu_keyboard() -> InlineKeyboardMarkup:
     keyboard = [
         [InlineKeyboardButton("➕ Add reminder", callback_data="TASKS_HELP")],
@@ -2029,6 +2318,7 @@ def build_tasks_menu_keyboard() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(keyboard)
 
 
+@functools.cache
 def build_stats_menu_keyboard() -> InlineKeyboardMarkup:
     keyboard = [
         [InlineKeyboardButton("📊 Farm summary", callback_data="STATS_SUMMARY")],
@@ -2040,9 +2330,6 @@ def build_stats_menu_keyboard() -> InlineKeyboardMarkup:
 
 async def menu_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Send the top-level button menu."""
-    if not await ensure_owner(update, context):
-        return
-
     text = (
         "🐰 *Rabbit Farm Menu*\n\n"
         "Choose what you want to do:\n"
@@ -2056,233 +2343,188 @@ async def menu_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     if update.message:
         await update.message.reply_text(
-            text, parse_mode="Markdown", reply_markup=build_main_menu_keyboard()
+            text, parse_mode="Markdown", reply_markup=MAIN_MENU_MARKUP
         )
     else:
         # just in case it’s called from a callback
         chat = update.effective_chat
         await chat.send_message(
-            text, parse_mode="Markdown", reply_markup=build_main_menu_keyboard()
+            text, parse_mode="Markdown", reply_markup=MAIN_MENU_MARKUP
         )
 
 
-async def menu_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handle all inline-menu button presses."""
-    # Only you (owner) can use the menu
-    if not await ensure_owner(update, context):
-        return
-
-    query = update.callback_query
-    await query.answer()
-    data = query.data
-
-    # ========== MAIN MENU / CLOSE ==========
-
-    if data in ("MENU_MAIN", "MENU_START"):
-        # Show main menu
-        await query.edit_message_text(
-            "🐰 *Rabbit Farm Menu*\n\n"
-            "Choose what you want to do:",
-            parse_mode="Markdown",
-            reply_markup=build_main_menu_keyboard(),
-        )
-        return
-
-    if data == "MENU_CLOSE":
-        # Just remove buttons (keep last text)
-        await query.edit_message_text("Menu closed.")
-        return
-
-    # ========== RABBITS MENU & ACTIONS ==========
-
-    # open Rabbits submenu
-    if data == "MENU_RABBITS":
-        await query.edit_message_text(
-            "🐰 *Rabbits*\n\nWhat do you want to do?",
-            parse_mode="Markdown",
-            reply_markup=build_rabbits_menu_keyboard(),
-        )
-        return
-
-    # NOTE: NO "if data == 'RABBITS_ADD'" HERE ANYMORE.
-    # That callback is now handled by the ConversationHandler entry_points.
-
-    # full rabbits list
-    if data == "MENU_RABBITS_ALL":
-        return await rabbits_cmd(update, context)
-
-    # active rabbits
-    if data == "MENU_RABBITS_ACTIVE":
-        return await active_cmd(update, context)
-
-    # back from rabbits submenu to main
-    if data == "MENU_RABBITS_BACK":
-        await query.edit_message_text(
-            "🐰 *Rabbit Farm Menu*\n\n"
-            "Choose what you want to do:",
-            parse_mode="Markdown",
-            reply_markup=build_main_menu_keyboard(),
-        )
-        return
-
-  
-
-    # ========== FINANCE MENU (OPTIONAL, IF YOU USE IT) ==========
-
-    if data == "MENU_FINANCE":
-        # If you have a separate finance keyboard, show it
-        # Otherwise, you can just send instructions or call /profit, etc.
-        try:
-            kb = build_finance_menu_keyboard()
-            await query.edit_message_text(
-                "💰 *Money & Feed*\n\nChoose an option:",
-                parse_mode="Markdown",
-                reply_markup=kb,
-            )
-        except NameError:
-            # Fallback: simple text if you don't have a finance keyboard
-            await query.edit_message_text(
-                "💰 Money & feed options:\n"
-                "- Use /profit for profit summary\n"
-                "- Use /feedstats for feed stats\n"
-                "- Use /expense, /feed, /electric to add records."
-            )
-        return
-
-    # Example: if you have a separate info/analytics menu
-    if data == "MENU_INFO":
-        try:
-            kb = build_info_menu_keyboard()
-            await query.edit_message_text(
-                "📊 *Info & Analytics*\n\nChoose an option:",
-                parse_mode="Markdown",
-                reply_markup=kb,
-            )
-        except NameError:
-            await query.edit_message_text(
-                "📊 Info & analytics:\n"
-                "- /stats\n"
-                "- /farmsummary\n"
-                "- /lineperformance NAME\n"
-                "- /keep NAME"
-            )
-        return
-
-    # ========== FALLBACK ==========
-    # If some unknown callback_data comes in, don't crash – just ignore politely.
-    await query.answer("Unknown menu item.", show_alert=False)
-
+MENU_TEXT = (
+    "🐰 *Rabbit Farm Menu*\n\n"
+    "Choose what you want to do:"
+)
 
-    # ----- BREEDING SECTION -----
-    if data == "MENU_BREEDING":
+# callback_data -> (text, keyboard builder) for buttons that just show a screen
+MENU_SCREENS = {
+    "MENU_MAIN": (MENU_TEXT, build_main_menu_keyboard),
+    "MENU_START": (MENU_TEXT, build_main_menu_keyboard),
+    "MENU_RABBITS_BACK": (MENU_TEXT, build_main_menu_keyboard),
+    # Just remove buttons
+    "MENU_CLOSE": ("Menu closed.", None),
+    "MENU_RABBITS": (
+        "🐰 *Rabbits*\n\nWhat do you want to do?",
+        build_rabbits_menu_keyboard,
+    ),
+    "MENU_FINANCE": (
+        "💰 Money & feed options:\n"
+        "- Use /profit for profit summary\n"
+        "- Use /feedstats for feed stats\n"
+        "- Use /expense, /feed, /electric to add records.",
+        None,
+    ),
+    "MENU_INFO": (
+        "📊 Info & analytics:\n"
+        "- /stats\n"
+        "- /farmsummary\n"
+        "- /lineperformance NAME\n"
+        "- /keep NAME",
+        None,
+    ),
+    "MENU_BREEDING": (
+        "💞 *Breeding menu*\n\n"
+        "Useful commands:\n"
+        "• `/breed DOE BUCK`\n"
+        "• `/kindling DOE LITTER_SIZE [NAME]`\n"
+        "• `/today` – what’s due today\n"
+        "• `/nextdue DOE` – next kindling date\n",
+        build_breeding_menu_keyboard,
+    ),
+    "BREED_CHECKPAIR": (
+        "To check a pair for inbreeding, use:\n"
+        "`/checkpair RABBIT1 RABBIT2`",
+        build_breeding_menu_keyboard,
+    ),
+    "MENU_MONEY": (
+        "💸 *Money menu*\n\n"
+        "Common commands:\n"
+        "• `/sell NAME PRICE [BUYER]`\n"
+        "• `/expense AMOUNT CATEGORY [NOTE]`\n"
+        "• `/profit` – all-time profit\n"
+        "• `/profitmonth YYYY-MM` – by month\n",
+        build_money_menu_keyboard,
+    ),
+    "MONEY_HELP": (
+        "Examples:\n"
+        "`/sell Luna 60 Giorgi`\n"
+        "`/expense 45 Feed pellets`\n",
+        build_money_menu_keyboard,
+    ),
+    "MENU_TASKS": (
+        "📅 *Tasks & reminders*\n\n"
+        "• `/remind YYYY-MM-DD TEXT`\n"
+        "• `/tasklist [PAGE]`\n"
+        "• `/donetask ID`\n",
+        build_tasks_menu_keyboard,
+    ),
+    "TASKS_HELP": (
+        "Example:\n"
+        "`/remind 2025-12-20 Clean cages`\n",
+        build_tasks_menu_keyboard,
+    ),
+    "MENU_STATS": (
+        "📊 *Stats & info*\n\n"
+        "• Farm summary: overall picture\n"
+        "• Info: details about one rabbit\n",
+        build_stats_menu_keyboard,
+    ),
+    "STATS_TREE_HELP": (
+        "To see a family tree, use:\n"
+        "`/tree RABBITNAME`",
+        build_stats_menu_keyboard,
+    ),
+}
+
+
+# Last screen shown per (chat_id, message_id) as (callback_data, monotonic
+# time of the edit), so repeated taps on the same button don't send an
+# identical edit (Telegram rejects those slowly).
+MENU_RENDER_CACHE_SIZE = 1024
+_last_menu_render = OrderedDict()
+
+# Telegram allows roughly one edit per second per message; taps arriving
+# faster than that are collapsed into a single trailing edit showing the
+# latest screen. (chat_id, message_id) -> (query, callback_data)
+MENU_EDIT_INTERVAL = 1.0
+_pending_menu_edits = {}
+
+
+def remember_menu_render(key, screen):
+    """Record what a menu message shows."""
+    _last_menu_render[key] = (screen, monotonic())
+    _last_menu_render.move_to_end(key)
+    while len(_last_menu_render) > MENU_RENDER_CACHE_SIZE:
+        _last_menu_render.popitem(last=False)
+
+
+async def show_menu_screen(query, key, data):
+    """Edit the menu message to show MENU_SCREENS[data], unless it already does."""
+    last = _last_menu_render.get(key)
+    if last is not None and last[0] == data:
+        return
+
+    text, keyboard = MENU_SCREENS[data]
+    try:
         await query.edit_message_text(
-            "💞 *Breeding menu*\n\n"
-            "Useful commands:\n"
-            "• `/breed DOE BUCK`\n"
-            "• `/kindling DOE LITTER_SIZE [NAME]`\n"
-            "• `/today` – what’s due today\n"
-            "• `/nextdue DOE` – next kindling date\n",
+            text,
             parse_mode="Markdown",
-            reply_markup=build_breeding_menu_keyboard(),
+            reply_markup=keyboard() if keyboard else None,
         )
-        return
+    except BadRequest as e:
+        if "not modified" not in str(e):
+            raise
+    remember_menu_render(key, data)
 
-    if data == "BREED_CHECKPAIR":
-        await query.edit_message_text(
-            "To check a pair for inbreeding, use:\n"
-            "`/checkpair RABBIT1 RABBIT2`",
-            parse_mode="Markdown",
-            reply_markup=build_breeding_menu_keyboard(),
-        )
-        return
 
-    if data == "BREED_TODAY":
-        # Re-use /today command logic
-        await today_cmd(update, context)
-        # Keep the same buttons below the message
-        await query.edit_message_reply_markup(reply_markup=build_breeding_menu_keyboard())
-        return
+async def flush_menu_edit(key, delay):
+    """Trailing edit: after delay, show the latest screen tapped meanwhile."""
+    await asyncio.sleep(delay)
+    pending = _pending_menu_edits.pop(key, None)
+    if pending is not None:
+        query, data = pending
+        await show_menu_screen(query, key, data)
 
-    # ----- MONEY SECTION -----
-    if data == "MENU_MONEY":
-        await query.edit_message_text(
-            "💸 *Money menu*\n\n"
-            "Common commands:\n"
-            "• `/sell NAME PRICE [BUYER]`\n"
-            "• `/expense AMOUNT CATEGORY [NOTE]`\n"
-            "• `/profit` – all-time profit\n"
-            "• `/profitmonth YYYY-MM` – by month\n",
-            parse_mode="Markdown",
-            reply_markup=build_money_menu_keyboard(),
-        )
-        return
 
-    if data == "MONEY_HELP":
-        await query.edit_message_text(
-            "Examples:\n"
-            "`/sell Luna 60 Giorgi`\n"
-            "`/expense 45 Feed pellets`\n",
-            parse_mode="Markdown",
-            reply_markup=build_money_menu_keyboard(),
-        )
-        return
-
-    if data == "MONEY_PROFIT":
-        await profit_cmd(update, context)
-        await query.edit_message_reply_markup(reply_markup=build_money_menu_keyboard())
-        return
-
-    # ----- TASKS SECTION -----
-    if data == "MENU_TASKS":
-        await query.edit_message_text(
-            "📅 *Tasks & reminders*\n\n"
-            "• `/remind YYYY-MM-DD TEXT`\n"
-            "• `/tasklist`\n"
-            "• `/donetask ID`\n",
-            parse_mode="Markdown",
-            reply_markup=build_tasks_menu_keyboard(),
-        )
-        return
+@owner_required
+async def menu_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle all inline-menu button presses."""
+    query = update.callback_query
+    data = query.data
 
-    if data == "TASKS_HELP":
-        await query.edit_message_text(
-            "Example:\n"
-            "`/remind 2025-12-20 Clean cages`\n",
-            parse_mode="Markdown",
-            reply_markup=build_tasks_menu_keyboard(),
-        )
+    screen = MENU_SCREENS.get(data)
+    action = MENU_ACTIONS.get(data) if screen is None else None
+    if screen is None and action is None:
+        # If some unknown callback_data comes in, don't crash – just ignore politely.
+        await query.answer("Unknown menu item.", show_alert=False)
         return
 
-    if data == "TASKS_LIST":
-        await tasklist_cmd(update, context)
-        await query.edit_message_reply_markup(reply_markup=build_tasks_menu_keyboard())
-        return
+    # Answer in the background so the client's spinner stops while the
+    # edit below is already on its way (Application.create_task keeps a
+    # reference to the task and logs any error).
+    context.application.create_task(query.answer(), update=update)
+    render_key = (query.message.chat_id, query.message.message_id)
 
-    # ----- STATS SECTION -----
-    if data == "MENU_STATS":
-        await query.edit_message_text(
-            "📊 *Stats & info*\n\n"
-            "• Farm summary: overall picture\n"
-            "• Info: details about one rabbit\n",
-            parse_mode="Markdown",
-            reply_markup=build_stats_menu_keyboard(),
-        )
-        return
+    if screen is not None:
+        if render_key in _pending_menu_edits:
+            # A trailing edit is already scheduled; make it show this screen
+            _pending_menu_edits[render_key] = (query, data)
+            return
 
-    if data == "STATS_SUMMARY":
-        await farmsummary_cmd(update, context)
-        await query.edit_message_reply_markup(reply_markup=build_stats_menu_keyboard())
-        return
+        last = _last_menu_render.get(render_key)
+        wait = MENU_EDIT_INTERVAL - (monotonic() - last[1]) if last else 0
+        if wait > 0 and last[0] != data:
+            _pending_menu_edits[render_key] = (query, data)
+            context.application.create_task(flush_menu_edit(render_key, wait), update=update)
+            return
 
-    if data == "STATS_TREE_HELP":
-        await query.edit_message_text(
-            "To see a family tree, use:\n"
-            "`/tree RABBITNAME`",
-            parse_mode="Markdown",
-            reply_markup=build_stats_menu_keyboard(),
-        )
+        await show_menu_screen(query, render_key, data)
         return
 
+    # NOTE: "RABBITS_ADD" is handled by the ConversationHandler entry_points.
+    await action(update, context)
 
 
 async def whoami_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -2293,13 +2535,22 @@ async def whoami_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 # ================== ADD-RABBIT WIZARD ==================
 
+# user_data keys filled in by the wizard steps below
+WIZARD_KEYS = ("name", "sex", "cage", "section")
+
+
+def clear_wizard_data(context: ContextTypes.DEFAULT_TYPE):
+    """Drop wizard answers so they don't linger in (persisted) user_data."""
+    for key in WIZARD_KEYS:
+        context.user_data.pop(key, None)
+
+
+@owner_required
 async def addrabbit_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Step 1: ask for name (works from /addrabbit and from the button)."""
-    if not await ensure_owner(update, context):
-        return ConversationHandler.END
-
     # Works for both normal messages and callback queries:
     message = update.effective_message
+    clear_wizard_data(context)
 
     await message.reply_text(
         "➕ Adding a new rabbit.\n\n"
@@ -2312,9 +2563,6 @@ async def addrabbit_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def addrabbit_name(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Got name, now ask for sex."""
-    if not await ensure_owner(update, context):
-        return ConversationHandler.END
-
     name = update.message.text.strip()
     if not name:
         await update.message.reply_text("Please send a non-empty name.")
@@ -2322,7 +2570,7 @@ async def addrabbit_name(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     context.user_data["name"] = name
     await update.message.reply_text(
-        f"Name set to *{name}*.\n\n"
+        f"Name set to *{escape_markdown(name)}*.\n\n"
         "2️⃣ Is it male or female? Reply with *M* or *F*:",
         parse_mode="Markdown",
     )
@@ -2331,9 +2579,6 @@ async def addrabbit_name(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def addrabbit_sex(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Got sex, now ask for cage."""
-    if not await ensure_owner(update, context):
-        return ConversationHandler.END
-
     sex = update.message.text.strip().upper()
     if sex not in ("M", "F"):
         await update.message.reply_text("Please reply with M or F.")
@@ -2350,9 +2595,6 @@ async def addrabbit_sex(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def addrabbit_cage(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Got cage, now ask for section (optional)."""
-    if not await ensure_owner(update, context):
-        return ConversationHandler.END
-
     cage = update.message.text.strip()
     if not cage:
         await update.message.reply_text("Please send a cage number.")
@@ -2370,9 +2612,6 @@ async def addrabbit_cage(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def addrabbit_section(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Got section (or skip), now ask for weight (optional)."""
-    if not await ensure_owner(update, context):
-        return ConversationHandler.END
-
     text = update.message.text.strip()
     if text.lower() == "skip":
         context.user_data["section"] = None
@@ -2390,9 +2629,6 @@ async def addrabbit_section(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def addrabbit_weight(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Final step: create rabbit, then show summary."""
-    if not await ensure_owner(update, context):
-        return ConversationHandler.END
-
     text = update.message.text.strip()
     weight = None
     if text.lower() != "skip":
@@ -2413,39 +2649,34 @@ async def addrabbit_weight(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     if not name or not sex:
         await update.message.reply_text("Something went wrong, cancelling.")
+        clear_wizard_data(context)
         return ConversationHandler.END
 
-    # 1) Create rabbit
-    ok = add_rabbit(name, sex)
+    # 1) Create rabbit with cage/section and weight in one transaction
+    ok = add_rabbit_full(name, sex, cage, section, weight)
     if not ok:
         await update.message.reply_text(
             "❌ A rabbit with that name already exists. Cancelling."
         )
+        clear_wizard_data(context)
         return ConversationHandler.END
 
-    # 2) Set cage/section
-    if cage:
-        set_cage_section(name, cage, section)
-
-    # 3) Set weight if provided
-    if weight is not None:
-        add_weight(name, weight)
-
-    # 4) Build nice summary message
+    # 2) Build nice summary message
     details = []
     if cage:
-        loc = f"cage {cage}"
+        loc = f"cage {escape_markdown(cage)}"
         if section:
-            loc += f" / section {section}"
+            loc += f" / section {escape_markdown(section)}"
         details.append(loc)
     if weight is not None:
         details.append(f"weight {weight} kg")
 
-    msg = f"✅ Rabbit *{name}* ({sex}) added."
+    msg = f"✅ Rabbit *{escape_markdown(name)}* ({sex}) added."
     if details:
         msg += "\n" + ", ".join(details)
 
     await update.message.reply_text(msg, parse_mode="Markdown")
+    clear_wizard_data(context)
     return ConversationHandler.END
 
 
@@ -2453,117 +2684,150 @@ async def addrabbit_cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Allow user to cancel the wizard with /cancel."""
     if update.message:
         await update.message.reply_text("❌ Add-rabbit cancelled.")
+    clear_wizard_data(context)
     return ConversationHandler.END
 
 
 
+# ---- Argument parsing ----
+
+def parse_args(message, min_n: int, maxsplit: int = -1):
+    """
+    Split a command message into words, or return None if it has fewer
+    than min_n. For commands whose last argument is free text (a note, a
+    reason): with maxsplit, the last part holds the rest of the message
+    as typed. Fixed-word commands just use context.args.
+    """
+    parts = (message.text or "").split(maxsplit=maxsplit)
+    return parts if len(parts) >= min_n else None
+
+
 # ---- Rabbits ----
 
+# Telegram rejects messages over 4096 chars; keep some headroom.
+MAX_MESSAGE_CHARS = 4000
+
+# SQLite printf() formats, filled with name, sex, cage, section, status
+# (see list_rabbits_formatted; unused trailing values are ignored).
+RABBIT_ROW_FORMAT = (
+    "• %s (%s)\n"
+    "  Cage: %s\n"
+    "  Section: %s\n"
+    "  Status: %s\n"
+    "---------------------------"
+)
+ACTIVE_RABBIT_ROW_FORMAT = (
+    "• %s (%s)\n"
+    "  Cage: %s\n"
+    "  Section: %s\n"
+    "---------------------------"
+)
+
+
+def split_long_lines(lines, limit):
+    """Yield lines, hard-splitting any longer than `limit` (e.g. a huge task note)."""
+    for line in lines:
+        if len(line) <= limit:
+            yield line
+        else:
+            for i in range(0, len(line), limit):
+                yield line[i:i + limit]
+
+
+def paginate_lines(lines, limit=MAX_MESSAGE_CHARS):
+    """Join lines with newlines into as few pages as fit under `limit` chars."""
+    pages = []
+    chunk = []
+    size = 0
+    for line in split_long_lines(lines, limit):
+        extra = len(line) + 1 if chunk else len(line)
+        if chunk and size + extra > limit:
+            pages.append("\n".join(chunk))
+            chunk = []
+            extra = len(line)
+            size = 0
+        chunk.append(line)
+        size += extra
+    if chunk:
+        pages.append("\n".join(chunk))
+    return pages
+
+
+async def reply_paged(message, lines, **kwargs):
+    """Send `lines` as one reply per page (see paginate_lines)."""
+    for page in paginate_lines(lines):
+        await message.reply_text(page, **kwargs)
+
 
 async def rabbits_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """List all rabbits (full view). Works from /rabbits and from menu buttons."""
-    if not await ensure_owner(update, context):
-        return
-
     # This works for BOTH messages and callback queries
     message = update.effective_message
 
-    rows = list_rabbits(active_only=False)
+    rows = list_rabbits_formatted(RABBIT_ROW_FORMAT, active_only=False)
     if not rows:
         await message.reply_text("No rabbits in database.")
         return
 
-    lines = ["🐰 *All rabbits (full view)*", ""]
-    for r in rows:
-        cage = r["cage"] or "—"
-        section = r["section"] or "—"
-        status = r["status"]
-        lines.append(
-            f"• {r['name']} ({r['sex']})\n"
-            f"  Cage: {cage}\n"
-            f"  Section: {section}\n"
-            f"  Status: {status}\n"
-            "---------------------------"
-        )
+    # Plain text: rabbit names may contain Markdown characters like _ or *
+    lines = ["🐰 All rabbits (full view)", ""]
+    lines.extend(rows)
 
-    await message.reply_text("\n".join(lines), parse_mode="Markdown")
+    await reply_paged(message, lines)
 
 
 
 
 async def active_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """List only active (alive, not sold) rabbits. Works from /active and from menu buttons."""
-    if not await ensure_owner(update, context):
-        return
-
     message = update.effective_message
 
-    rows = list_rabbits(active_only=True)
+    rows = list_rabbits_formatted(ACTIVE_RABBIT_ROW_FORMAT, active_only=True)
     if not rows:
         await message.reply_text("No active rabbits.")
         return
 
-    lines = ["🐰 *Active rabbits*", ""]
-    for r in rows:
-        cage = r["cage"] or "—"
-        section = r["section"] or "—"
-        lines.append(
-            f"• {r['name']} ({r['sex']})\n"
-            f"  Cage: {cage}\n"
-            f"  Section: {section}\n"
-            "---------------------------"
-        )
+    lines = ["🐰 Active rabbits", ""]
+    lines.extend(rows)
 
-    await message.reply_text("\n".join(lines), parse_mode="Markdown")
+    await reply_paged(message, lines)
 
 
 
 async def setcage_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not await ensure_owner(update, context):
-        return
-
-    parts = update.message.text.split()
-    if len(parts) < 3:
+    args = context.args
+    if len(args) < 2:
         await update.message.reply_text("Usage: /setcage NAME CAGE [SECTION]")
         return
-    name = parts[1]
-    cage = parts[2]
-    section = parts[3] if len(parts) > 3 else None
+    name = args[0]
+    cage = args[1]
+    section = args[2] if len(args) > 2 else None
     msg = set_cage_section(name, cage, section)
     await update.message.reply_text(msg)
 
 
 async def setparents_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not await ensure_owner(update, context):
-        return
-
-    parts = update.message.text.split()
-    if len(parts) < 4:
+    args = context.args
+    if len(args) < 3:
         await update.message.reply_text("Usage: /setparents CHILD MOTHER FATHER")
         return
-    child, mother, father = parts[1], parts[2], parts[3]
+    child, mother, father = args[0], args[1], args[2]
     msg = update_rabbit_parents(child, mother, father)
     await update.message.reply_text(msg)
 
 
 async def checkpair_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not await ensure_owner(update, context):
-        return
-
-    parts = update.message.text.split()
-    if len(parts) < 3:
+    args = context.args
+    if len(args) < 2:
         await update.message.reply_text("Usage: /checkpair RABBIT1 RABBIT2")
         return
-    msg = checkpair_inbreeding(parts[1], parts[2])
+    msg = checkpair_inbreeding(args[0], args[1])
     await update.message.reply_text(msg)
 
 
 async def markdead_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not await ensure_owner(update, context):
-        return
-
-    parts = update.message.text.split(maxsplit=2)
-    if len(parts) < 2:
+    parts = parse_args(update.message, 2, maxsplit=2)
+    if parts is None:
         await update.message.reply_text("Usage: /markdead NAME [REASON]")
         return
     name = parts[1]
@@ -2574,11 +2838,8 @@ async def markdead_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def deleterabbit_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Delete a single rabbit permanently by name."""
-    if not await ensure_owner(update, context):
-        return
-
-    parts = update.message.text.split(maxsplit=1)
-    if len(parts) < 2:
+    parts = parse_args(update.message, 2, maxsplit=1)
+    if parts is None:
         await update.message.reply_text("Usage: /deleterabbit NAME")
         return
 
@@ -2592,19 +2853,17 @@ async def deleterabbit_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     cur = conn.cursor()
     cur.execute("DELETE FROM rabbits WHERE id = ?", (rabbit["id"],))
     conn.commit()
+    invalidate_rabbit_cache()
     conn.close()
 
     await update.message.reply_text(
-        f"✅ Rabbit *{name}* was permanently deleted.",
+        f"✅ Rabbit *{escape_markdown(name)}* was permanently deleted.",
         parse_mode="Markdown",
     )
 
 
 async def resetfarm_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Erase ALL farm data (rabbits, breedings, etc). Use with care!"""
-    if not await ensure_owner(update, context):
-        return
-
     conn = get_db()
     cur = conn.cursor()
 
@@ -2630,6 +2889,9 @@ async def resetfarm_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     conn.commit()
     conn.close()
+    SETTINGS_CACHE.clear()
+    invalidate_rabbit_cache()
+    render_achievements.cache_clear()
 
     await update.message.reply_text("⚠️ All farm data has been erased.")
 
@@ -2638,14 +2900,11 @@ async def resetfarm_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
 # ---- Breeding & litters ----
 
 async def breed_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not await ensure_owner(update, context):
-        return
-
-    parts = update.message.text.split()
-    if len(parts) < 3:
+    args = context.args
+    if len(args) < 2:
         await update.message.reply_text("Usage: /breed DOE BUCK")
         return
-    doe, buck = parts[1], parts[2]
+    doe, buck = args[0], args[1]
 
     severity, warning = assess_inbreeding(doe, buck)
     if severity == "error":
@@ -2668,14 +2927,11 @@ async def breed_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def forcebreed_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Same as /breed but ignores inbreeding warnings (still blocks errors)."""
-    if not await ensure_owner(update, context):
-        return
-
-    parts = update.message.text.split()
-    if len(parts) < 3:
+    args = context.args
+    if len(args) < 2:
         await update.message.reply_text("Usage: /forcebreed DOE BUCK")
         return
-    doe, buck = parts[1], parts[2]
+    doe, buck = args[0], args[1]
 
     severity, warning = assess_inbreeding(doe, buck)
     if severity == "error":
@@ -2690,11 +2946,8 @@ async def forcebreed_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 async def kindling_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not await ensure_owner(update, context):
-        return
-
-    parts = update.message.text.split(maxsplit=3)
-    if len(parts) < 3:
+    parts = parse_args(update.message, 3, maxsplit=3)
+    if parts is None:
         await update.message.reply_text("Usage: /kindling DOE LITTER_SIZE [LITTERNAME]")
         return
     doe = parts[1]
@@ -2709,14 +2962,11 @@ async def kindling_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 async def litters_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not await ensure_owner(update, context):
-        return
-
-    parts = update.message.text.split()
-    if len(parts) < 2:
+    args = context.args
+    if not args:
         await update.message.reply_text("Usage: /litters DOE")
         return
-    doe_name = parts[1]
+    doe_name = args[0]
     doe, rows = get_litters_for_doe(doe_name)
     if not doe:
         await update.message.reply_text("❌ Doe not found.")
@@ -2724,21 +2974,18 @@ async def litters_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not rows:
         await update.message.reply_text("No litters recorded for this doe.")
         return
-    lines = []
+    lines = [f"🍼 Litters for {doe_name}:"]
     for r in rows:
         ln = r["litter_name"] or "(no name)"
         lines.append(
             f"{r['kindling_date']}: {ln} – {r['litter_size']} kits (buck: {r['buck_name']})"
         )
-    await update.message.reply_text(f"🍼 Litters for {doe_name}:\n" + "\n".join(lines))
+    await reply_paged(update.message, lines)
 
 
 async def littername_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not await ensure_owner(update, context):
-        return
-
-    parts = update.message.text.split(maxsplit=2)
-    if len(parts) < 3:
+    parts = parse_args(update.message, 3, maxsplit=2)
+    if parts is None:
         await update.message.reply_text("Usage: /littername DOE LITTERNAME")
         return
     doe, ln = parts[1], parts[2]
@@ -2747,14 +2994,11 @@ async def littername_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 async def nextdue_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not await ensure_owner(update, context):
-        return
-
-    parts = update.message.text.split()
-    if len(parts) < 2:
+    args = context.args
+    if not args:
         await update.message.reply_text("Usage: /nextdue DOE")
         return
-    doe = parts[1]
+    doe = args[0]
     nxt = get_next_due_for_doe(doe)
     if not nxt:
         await update.message.reply_text("No upcoming due date for this doe.")
@@ -2765,13 +3009,12 @@ async def nextdue_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 async def today_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not await ensure_owner(update, context):
-        return
-
-    dues = get_due_today()
-    tasks = get_tasks_for_date(date.today())
+    today = date.today()
+    dues, weans, tasks = await asyncio.to_thread(get_daily_bundle, today)
+    # Served from SETTINGS_CACHE, so no thread hop needed
+    climate_short = get_climate_warning_short()
 
-    lines = [f"🐰 Today: {date.today().isoformat()}"]
+    lines = [f"🐰 Today: {today.isoformat()}"]
 
     if dues:
         lines.append("\n🍼 Kindlings due today:")
@@ -2779,7 +3022,6 @@ async def today_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     else:
         lines.append("\nNo kindlings due today.")
 
-    weans = get_weaning_today()
     if weans:
         lines.append("\n🐇 Weaning today:")
         lines.extend([f"- {r['name']}" for r in weans])
@@ -2788,26 +3030,21 @@ async def today_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     if tasks:
         lines.append("\n📌 Tasks for today:")
-        for t in tasks:
-            line = f"- #{t['id']} [{t['task_date']}] {t['title']}"
-            if t["note"]:
-                line += f" – {t['note']}"
-            lines.append(line)
+        lines.extend(
+            f"- #{t['id']} [{t['task_date']}] {t['title']}"
+            + (f" – {t['note']}" if t["note"] else "")
+            for t in tasks
+        )
     else:
         lines.append("\nNo tasks for today.")
 
-    climate_short = get_climate_warning_short()
     if climate_short:
-        lines.append("\n🌡 Climate alert:")
-        lines.append(climate_short)
+        lines.extend(("\n🌡 Climate alert:", climate_short))
 
-    await update.message.reply_text("\n".join(lines))
+    await update.effective_message.reply_text("\n".join(lines))
 
 
 async def weaning_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not await ensure_owner(update, context):
-        return
-
     rows = get_weaning_today()
     if not rows:
         await update.message.reply_text("No weaning scheduled for today.")
@@ -2817,9 +3054,6 @@ async def weaning_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 async def suggestbreed_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not await ensure_owner(update, context):
-        return
-
     pairs = suggest_breeding_pairs(limit=5)
     if not pairs:
         await update.message.reply_text(
@@ -2842,11 +3076,8 @@ async def suggestbreed_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
 # ---- Health & weights ----
 
 async def health_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not await ensure_owner(update, context):
-        return
-
-    parts = update.message.text.split(maxsplit=2)
-    if len(parts) < 3:
+    parts = parse_args(update.message, 3, maxsplit=2)
+    if parts is None:
         await update.message.reply_text("Usage: /health NAME note...")
         return
     name = parts[1]
@@ -2856,35 +3087,30 @@ async def health_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 async def healthlog_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not await ensure_owner(update, context):
-        return
-
-    parts = update.message.text.split()
-    if len(parts) < 2:
+    args = context.args
+    if not args:
         await update.message.reply_text("Usage: /healthlog NAME")
         return
-    rabbit, rows = get_health_log(parts[1], limit=10)
+    rabbit, rows = get_health_log(args[0], limit=10)
     if not rabbit:
         await update.message.reply_text("❌ Rabbit not found.")
         return
     if not rows:
         await update.message.reply_text("No health records.")
         return
-    lines = [f"{r['record_date']}: {r['note']}" for r in rows]
-    await update.message.reply_text(f"🩺 Health log for {rabbit['name']}:\n" + "\n".join(lines))
+    lines = [f"🩺 Health log for {rabbit['name']}:"]
+    lines.extend(f"{r['record_date']}: {r['note']}" for r in rows)
+    await reply_paged(update.message, lines)
 
 
 async def weight_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not await ensure_owner(update, context):
-        return
-
-    parts = update.message.text.split()
-    if len(parts) < 3:
+    args = context.args
+    if len(args) < 2:
         await update.message.reply_text("Usage: /weight NAME KG")
         return
-    name = parts[1]
+    name = args[0]
     try:
-        w = float(parts[2])
+        w = float(args[1])
     except ValueError:
         await update.message.reply_text("KG must be a number.")
         return
@@ -2893,46 +3119,38 @@ async def weight_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 async def weightlog_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not await ensure_owner(update, context):
-        return
-
-    parts = update.message.text.split()
-    if len(parts) < 2:
+    args = context.args
+    if not args:
         await update.message.reply_text("Usage: /weightlog NAME")
         return
-    rabbit, rows = get_weight_log(parts[1], limit=10)
+    rabbit, rows = get_weight_log(args[0], limit=10)
     if not rabbit:
         await update.message.reply_text("❌ Rabbit not found.")
         return
     if not rows:
         await update.message.reply_text("No weight records.")
         return
-    lines = [f"{r['weigh_date']}: {r['weight_kg']} kg" for r in rows]
-    await update.message.reply_text(f"⚖️ Weight log for {rabbit['name']}:\n" + "\n".join(lines))
+    lines = [f"⚖️ Weight log for {rabbit['name']}:"]
+    lines.extend(f"{r['weigh_date']}: {r['weight_kg']} kg" for r in rows)
+    await reply_paged(update.message, lines)
 
 
 async def growth_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not await ensure_owner(update, context):
-        return
-
-    parts = update.message.text.split()
-    if len(parts) < 2:
+    args = context.args
+    if not args:
         await update.message.reply_text("Usage: /growth NAME")
         return
-    name = parts[1]
+    name = args[0]
     msg = compute_growth_message(name)
     await update.message.reply_text(msg)
 
 
 async def growthchart_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not await ensure_owner(update, context):
-        return
-
-    parts = update.message.text.split()
-    if len(parts) < 2:
+    args = context.args
+    if not args:
         await update.message.reply_text("Usage: /growthchart NAME")
         return
-    name = parts[1]
+    name = args[0]
     msg = build_growth_chart_ascii(name)
     await update.message.reply_text(msg)
 
@@ -2940,11 +3158,8 @@ async def growthchart_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
 # ---- Money & feed ----
 
 async def sell_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not await ensure_owner(update, context):
-        return
-
-    parts = update.message.text.split(maxsplit=3)
-    if len(parts) < 3:
+    parts = parse_args(update.message, 3, maxsplit=3)
+    if parts is None:
         await update.message.reply_text("Usage: /sell NAME PRICE [BUYER]")
         return
     name = parts[1]
@@ -2959,11 +3174,8 @@ async def sell_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 async def expense_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not await ensure_owner(update, context):
-        return
-
-    parts = update.message.text.split(maxsplit=3)
-    if len(parts) < 3:
+    parts = parse_args(update.message, 3, maxsplit=3)
+    if parts is None:
         await update.message.reply_text("Usage: /expense AMOUNT CATEGORY [NOTE]")
         return
     try:
@@ -2978,11 +3190,8 @@ async def expense_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 async def electric_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not await ensure_owner(update, context):
-        return
-
-    parts = update.message.text.split(maxsplit=2)
-    if len(parts) < 2:
+    parts = parse_args(update.message, 2, maxsplit=2)
+    if parts is None:
         await update.message.reply_text("Usage: /electric AMOUNT [NOTE]")
         return
     try:
@@ -2996,11 +3205,8 @@ async def electric_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 async def feed_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not await ensure_owner(update, context):
-        return
-
-    parts = update.message.text.split(maxsplit=3)
-    if len(parts) < 3:
+    parts = parse_args(update.message, 3, maxsplit=3)
+    if parts is None:
         await update.message.reply_text("Usage: /feed KG COST [NOTE]")
         return
     try:
@@ -3014,159 +3220,116 @@ async def feed_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(msg)
 
 
-async def profit_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not await ensure_owner(update, context):
-        return
+async def send_profit(message, period=None):
+    """Reply with the profit summary for period (YYYY or YYYY-MM), or all time."""
+    inc, exp, prof = await asyncio.to_thread(get_profit_summary, period)
+    label = "(all time)" if period is None else f"for {period}"
+    await message.reply_text(
+        f"💰 Profit {label}:\nIncome: {inc}\nExpenses: {exp}\nProfit: {prof}"
+    )
 
-    inc, exp, prof = get_profit_summary(None)
-    await update.message.reply_text(
-        f"💰 Profit (all time):\nIncome: {inc}\nExpenses: {exp}\nProfit: {prof}"
+
+async def send_feed_stats(message, period=None):
+    """Reply with feed totals for period (YYYY-MM), or all time."""
+    kg, cost = await asyncio.to_thread(get_feed_stats, period)
+    label = "(all time)" if period is None else f"for {period}"
+    await message.reply_text(
+        f"🌾 Feed stats {label}:\nTotal feed: {kg} kg\nCost: {cost}"
     )
 
 
-async def profitmonth_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not await ensure_owner(update, context):
-        return
+async def profit_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await send_profit(update.effective_message)
+
 
-    parts = update.message.text.split()
-    if len(parts) < 2:
+async def profitmonth_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    args = context.args
+    if not args:
         await update.message.reply_text("Usage: /profitmonth YYYY-MM")
         return
-    period = parts[1]
-    inc, exp, prof = get_profit_summary(period)
-    await update.message.reply_text(
-        f"💰 Profit for {period}:\nIncome: {inc}\nExpenses: {exp}\nProfit: {prof}"
-    )
+    await send_profit(update.message, args[0])
 
 
 async def profityear_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not await ensure_owner(update, context):
-        return
-
-    parts = update.message.text.split()
-    if len(parts) < 2:
+    args = context.args
+    if not args:
         await update.message.reply_text("Usage: /profityear YYYY")
         return
-    period = parts[1]
-    inc, exp, prof = get_profit_summary(period)
-    await update.message.reply_text(
-        f"💰 Profit for {period}:\nIncome: {inc}\nExpenses: {exp}\nProfit: {prof}"
-    )
+    await send_profit(update.message, args[0])
 
 
 async def feedstats_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not await ensure_owner(update, context):
-        return
-
-    kg, cost = get_feed_stats(None)
-    await update.message.reply_text(
-        f"🌾 Feed stats (all time):\nTotal feed: {kg} kg\nCost: {cost}"
-    )
+    await send_feed_stats(update.message)
 
 
 async def feedmonth_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not await ensure_owner(update, context):
-        return
-
-    parts = update.message.text.split()
-    if len(parts) < 2:
+    args = context.args
+    if not args:
         await update.message.reply_text("Usage: /feedmonth YYYY-MM")
         return
-    period = parts[1]
-    kg, cost = get_feed_stats(period)
-    await update.message.reply_text(
-        f"🌾 Feed stats for {period}:\nTotal feed: {kg} kg\nCost: {cost}"
-    )
+    await send_feed_stats(update.message, args[0])
 
 
 # ---- Exports & backup ----
 
-async def export_rabbits_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not await ensure_owner(update, context):
-        return
-
-    headers = ["id", "name", "sex", "mother_id", "father_id",
-               "cage", "section", "status", "death_date", "death_reason", "photo_file_id"]
-    path = export_table_to_csv("SELECT * FROM rabbits ORDER BY id", None, headers, "rabbits")
-    if not path:
-        await update.message.reply_text("No rabbits to export.")
-        return
-    await context.bot.send_document(
-        chat_id=update.effective_chat.id,
-        document=open(path, "rb"),
-        filename="rabbits_export.csv",
-        caption="🐰 Rabbits export"
-    )
-    os.remove(path)
-
-
-async def export_breedings_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not await ensure_owner(update, context):
-        return
-
-    headers = ["id", "doe_id", "buck_id", "mating_date",
-               "expected_due_date", "kindling_date", "litter_size", "weaning_date", "litter_name"]
-    path = export_table_to_csv("SELECT * FROM breedings ORDER BY id", None, headers, "breedings")
-    if not path:
-        await update.message.reply_text("No breedings to export.")
-        return
-    await context.bot.send_document(
-        chat_id=update.effective_chat.id,
-        document=open(path, "rb"),
-        filename="breedings_export.csv",
-        caption="🍼 Breedings export"
-    )
-    os.remove(path)
-
-
-async def export_sales_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not await ensure_owner(update, context):
-        return
-
-    headers = ["id", "rabbit_id", "sale_date", "price", "buyer"]
-    path = export_table_to_csv("SELECT * FROM sales ORDER BY id", None, headers, "sales")
-    if not path:
-        await update.message.reply_text("No sales to export.")
-        return
+async def send_csv_export(update: Update, context: ContextTypes.DEFAULT_TYPE,
+                          data: bytes, filename: str, caption: str):
+    """Upload an in-memory CSV export as a document."""
     await context.bot.send_document(
         chat_id=update.effective_chat.id,
-        document=open(path, "rb"),
-        filename="sales_export.csv",
-        caption="💸 Sales export"
+        document=InputFile(io.BytesIO(data), filename=filename),
+        caption=caption
     )
-    os.remove(path)
 
 
-async def export_expenses_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not await ensure_owner(update, context):
-        return
-
-    headers = ["id", "exp_date", "category", "amount", "note"]
-    path = export_table_to_csv("SELECT * FROM expenses ORDER BY id", None, headers, "expenses")
-    if not path:
-        await update.message.reply_text("No expenses to export.")
-        return
-    await context.bot.send_document(
-        chat_id=update.effective_chat.id,
-        document=open(path, "rb"),
-        filename="expenses_export.csv",
-        caption="💰 Expenses export"
-    )
-    os.remove(path)
+# command -> (query, CSV headers, filename, caption, reply when empty)
+CSV_EXPORTS = {
+    "export_rabbits": (
+        "SELECT * FROM rabbits ORDER BY id",
+        ["id", "name", "sex", "mother_id", "father_id",
+         "cage", "section", "status", "death_date", "death_reason", "photo_file_id"],
+        "rabbits_export.csv", "🐰 Rabbits export", "No rabbits to export.",
+    ),
+    "export_breedings": (
+        "SELECT * FROM breedings ORDER BY id",
+        ["id", "doe_id", "buck_id", "mating_date",
+         "expected_due_date", "kindling_date", "litter_size", "weaning_date", "litter_name"],
+        "breedings_export.csv", "🍼 Breedings export", "No breedings to export.",
+    ),
+    "export_sales": (
+        "SELECT * FROM sales ORDER BY id",
+        ["id", "rabbit_id", "sale_date", "price", "buyer"],
+        "sales_export.csv", "💸 Sales export", "No sales to export.",
+    ),
+    "export_expenses": (
+        "SELECT * FROM expenses ORDER BY id",
+        ["id", "exp_date", "category", "amount", "note"],
+        "expenses_export.csv", "💰 Expenses export", "No expenses to export.",
+    ),
+}
+
+
+async def export_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/export_rabbits, /export_breedings, /export_sales, /export_expenses"""
+    # "/export_sales@MyBot" -> "export_sales"
+    command = update.message.text.split(maxsplit=1)[0][1:].split("@", 1)[0].lower()
+    query, headers, filename, caption, empty_text = CSV_EXPORTS[command]
+    data = await asyncio.to_thread(export_table_to_bytes, query, None, headers)
+    if not data:
+        await update.message.reply_text(empty_text)
+        return
+    await send_csv_export(update, context, data, filename, caption)
 
 
 async def backupdb_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not await ensure_owner(update, context):
-        return
-
     path = get_backup_db_path()
     if not path:
         await update.message.reply_text("Database file not found.")
         return
+    data = await asyncio.to_thread(get_db_snapshot)
     await context.bot.send_document(
         chat_id=update.effective_chat.id,
-        document=open(path, "rb"),
-        filename="rabbits.db",
+        document=InputFile(io.BytesIO(data), filename="rabbits.db"),
         caption="📦 Database backup"
     )
 
@@ -3174,11 +3337,8 @@ async def backupdb_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
 # ---- Tasks ----
 
 async def remind_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not await ensure_owner(update, context):
-        return
-
-    parts = update.message.text.split(maxsplit=2)
-    if len(parts) < 3:
+    parts = parse_args(update.message, 3, maxsplit=2)
+    if parts is None:
         await update.message.reply_text("Usage: /remind YYYY-MM-DD TEXT")
         return
     d_str = parts[1]
@@ -3192,33 +3352,43 @@ async def remind_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(msg)
 
 
+TASKLIST_PAGE_SIZE = 20
+
+
 async def tasklist_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not await ensure_owner(update, context):
+    """/tasklist [PAGE] – also opened from the tasks menu, where there are no args."""
+    args = context.args or []
+    try:
+        page = max(int(args[0]), 1) if args else 1
+    except ValueError:
+        await update.effective_message.reply_text("Usage: /tasklist [PAGE]")
         return
 
-    rows = get_upcoming_tasks(limit=20)
+    # One extra row tells us whether there is a next page
+    offset = (page - 1) * TASKLIST_PAGE_SIZE
+    rows = get_upcoming_tasks(limit=TASKLIST_PAGE_SIZE + 1, offset=offset)
     if not rows:
-        await update.message.reply_text("No upcoming tasks.")
+        text = "No upcoming tasks." if page == 1 else f"No tasks on page {page}."
+        await update.effective_message.reply_text(text)
         return
-    lines = []
-    for t in rows:
-        line = f"#{t['id']} [{t['task_date']}] {t['title']}"
-        if t["note"]:
-            line += f" – {t['note']}"
-        lines.append(line)
-    await update.message.reply_text("📌 Upcoming tasks:\n" + "\n".join(lines))
+    lines = [
+        f"#{t['id']} [{t['task_date']}] {t['title']}"
+        + (f" – {t['note']}" if t["note"] else "")
+        for t in rows[:TASKLIST_PAGE_SIZE]
+    ]
+    if len(rows) > TASKLIST_PAGE_SIZE:
+        lines.append(f"\nMore: /tasklist {page + 1}")
+    header = "📌 Upcoming tasks:" if page == 1 else f"📌 Upcoming tasks (page {page}):"
+    await update.effective_message.reply_text(header + "\n" + "\n".join(lines))
 
 
 async def donetask_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not await ensure_owner(update, context):
-        return
-
-    parts = update.message.text.split()
-    if len(parts) < 2:
+    args = context.args
+    if not args:
         await update.message.reply_text("Usage: /donetask ID")
         return
     try:
-        tid = int(parts[1])
+        tid = int(args[0])
     except ValueError:
         await update.message.reply_text("ID must be a number.")
         return
@@ -3232,76 +3402,55 @@ async def donetask_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
 # ---- Info & analytics ----
 
 async def info_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not await ensure_owner(update, context):
-        return
-
-    parts = update.message.text.split()
-    if len(parts) < 2:
+    args = context.args
+    if not args:
         await update.message.reply_text("Usage: /info NAME")
         return
-    msg = get_info_message(parts[1])
+    msg = get_info_message(args[0])
     await update.message.reply_text(msg)
 
 
 async def stats_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not await ensure_owner(update, context):
-        return
-
-    msg = get_stats_message()
+    msg = await asyncio.to_thread(get_stats_message)
     await update.message.reply_text(msg)
 
 
 async def farmsummary_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not await ensure_owner(update, context):
-        return
-
-    msg = get_farmsummary_message()
-    await update.message.reply_text(msg)
+    msg = await asyncio.to_thread(get_farmsummary_message)
+    await update.effective_message.reply_text(msg)
 
 
 async def tree_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not await ensure_owner(update, context):
-        return
-
-    parts = update.message.text.split()
-    if len(parts) < 2:
+    args = context.args
+    if not args:
         await update.message.reply_text("Usage: /tree NAME")
         return
-    name = parts[1]
-    msg = build_family_tree(name)
+    name = args[0]
+    msg = await asyncio.to_thread(build_family_tree, name)
     await update.message.reply_text(msg)
 
 
 async def lineperformance_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not await ensure_owner(update, context):
-        return
-
-    parts = update.message.text.split()
-    if len(parts) < 2:
+    args = context.args
+    if not args:
         await update.message.reply_text("Usage: /lineperformance NAME")
         return
-    name = parts[1]
-    msg = get_line_performance_message(name)
+    name = args[0]
+    msg = await asyncio.to_thread(get_line_performance_message, name)
     await update.message.reply_text(msg)
 
 
 async def keep_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not await ensure_owner(update, context):
-        return
-
-    parts = update.message.text.split()
-    if len(parts) < 2:
+    args = context.args
+    if not args:
         await update.message.reply_text("Usage: /keep NAME")
         return
-    name = parts[1]
-    msg = decide_keep_or_sell(name)
+    name = args[0]
+    msg = await asyncio.to_thread(decide_keep_or_sell, name)
     await update.message.reply_text(msg)
 
 async def resetfarm_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Dangerous: wipe almost all farm data."""
-    if not await ensure_owner(update, context):
-        return
-
     conn = get_db()
     cur = conn.cursor()
 
@@ -3329,6 +3478,9 @@ async def resetfarm_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     conn.commit()
     conn.close()
+    SETTINGS_CACHE.clear()
+    invalidate_rabbit_cache()
+    render_achievements.cache_clear()
 
     await update.message.reply_text("🚨 All farm data has been reset.")
 
@@ -3337,15 +3489,12 @@ async def resetfarm_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
 # ---- Climate ----
 
 async def settemp_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not await ensure_owner(update, context):
-        return
-
-    parts = update.message.text.split()
-    if len(parts) < 2:
+    args = context.args
+    if not args:
         await update.message.reply_text("Usage: /settemp C\nExample: /settemp 32")
         return
     try:
-        t = float(parts[1])
+        t = float(args[0])
     except ValueError:
         await update.message.reply_text("Temperature must be a number, in °C.")
         return
@@ -3356,9 +3505,6 @@ async def settemp_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 async def climatealert_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not await ensure_owner(update, context):
-        return
-
     msg = get_climate_warning_message()
     await update.message.reply_text(msg)
 
@@ -3366,15 +3512,12 @@ async def climatealert_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
 # ---- Photos ----
 
 async def photo_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not await ensure_owner(update, context):
-        return
-
     """Send stored photo of a rabbit."""
-    parts = update.message.text.split()
-    if len(parts) < 2:
+    args = context.args
+    if not args:
         await update.message.reply_text("Usage: /photo NAME")
         return
-    name = parts[1]
+    name = args[0]
     r = get_rabbit(name)
     if not r:
         await update.message.reply_text("❌ Rabbit not found.")
@@ -3393,9 +3536,6 @@ async def photo_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 async def photo_upload_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not await ensure_owner(update, context):
-        return
-
     """Handle incoming photos: caption must start with rabbit name."""
     if not update.message or not update.message.photo:
         return
@@ -3418,23 +3558,52 @@ async def photo_upload_handler(update: Update, context: ContextTypes.DEFAULT_TYP
 
 # ---- Gamified achievements ----
 
-async def achievements_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not await ensure_owner(update, context):
-        return
+# Rendered /achievements text by user id, so quick repeat taps don't rerun
+# compute_achievements(); ttl_cache drops it as soon as anything is written.
+ACHIEVEMENTS_TEXT_TTL = 5.0
 
-    achievements = compute_achievements()
-    await update.message.reply_text("🏅 Achievements:\n" + "\n".join(achievements))
+
+@ttl_cache(ACHIEVEMENTS_TEXT_TTL)
+def render_achievements(user_id) -> str:
+    return "🏅 Achievements:\n" + "\n".join(compute_achievements())
+
+
+async def achievements_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user = update.effective_user
+    text = render_achievements(user.id if user else None)
+    await update.message.reply_text(text)
 
 
 # ---- Subscribe / Unsubscribe (daily summary) ----
 
-async def daily_job(context: ContextTypes.DEFAULT_TYPE):
-    chat_id = context.job.chat_id
-    dues = get_due_today()
-    weans = get_weaning_today()
-    tasks = get_tasks_for_date(date.today())
+# Subscribed chat ids live in the settings table (JSON list) and one daily
+# broadcast job sends the same summary to all of them.
+SUBSCRIBERS_KEY = "daily_subscribers"
+DAILY_SUMMARY_TIME = time(hour=9, minute=0, second=0)
+# Sends in flight at once; a RetryAfter (flood limit) pauses that send
+# for the time Telegram asks and then retries it once.
+BROADCAST_CONCURRENCY = 10
+
+# Summary text by date -> (monotonic time, text), built once and shared
+# by everything sending it around the same time.
+DAILY_SUMMARY_CACHE = {}
+DAILY_SUMMARY_TTL = 300.0
+_daily_summary_lock = asyncio.Lock()
+# On quiet days the summary is skipped, except on this weekday (0 = Monday)
+# so subscribers still hear from the bot once a week.
+DAILY_SUMMARY_HEARTBEAT_WEEKDAY = 0
+
+
+def build_daily_summary(today) -> str | None:
+    """Today's summary text, or None if there is nothing worth sending."""
+    dues, weans, tasks = get_daily_bundle(today)
+    climate_short = get_climate_warning_short()
+
+    quiet = not (dues or weans or tasks or climate_short)
+    if quiet and today.weekday() != DAILY_SUMMARY_HEARTBEAT_WEEKDAY:
+        return None
 
-    lines = [f"🐰 Daily farm summary for {date.today().isoformat()}"]
+    lines = [f"🐰 Daily farm summary for {today.isoformat()}"]
 
     if dues:
         lines.append("\n🍼 Kindlings due today:")
@@ -3452,48 +3621,89 @@ async def daily_job(context: ContextTypes.DEFAULT_TYPE):
 
     if tasks:
         lines.append("\n📌 Tasks for today:")
-        for t in tasks:
-            line = f"- #{t['id']} {t['title']}"
-            if t["note"]:
-                line += f" – {t['note']}"
-            lines.append(line)
+        lines.extend(
+            f"- #{t['id']} {t['title']}"
+            + (f" – {t['note']}" if t["note"] else "")
+            for t in tasks
+        )
     else:
         lines.append("\nNo tasks for today.")
 
-    climate_short = get_climate_warning_short()
     if climate_short:
         lines.append("\n🌡 Climate alert:")
         lines.append(climate_short)
 
+    return "\n".join(lines)
+
+
+async def get_daily_summary() -> str | None:
+    """Today's summary (see build_daily_summary), built at most once per DAILY_SUMMARY_TTL."""
+    today = date.today()
+    async with _daily_summary_lock:
+        cached = DAILY_SUMMARY_CACHE.get(today)
+        if cached is not None and monotonic() - cached[0] < DAILY_SUMMARY_TTL:
+            return cached[1]
+        text = await asyncio.to_thread(build_daily_summary, today)
+        DAILY_SUMMARY_CACHE.clear()  # drop earlier days
+        DAILY_SUMMARY_CACHE[today] = (monotonic(), text)
+        return text
+
+
+def get_subscribers() -> set[int]:
+    raw = get_setting(SUBSCRIBERS_KEY)
+    return set(json.loads(raw)) if raw else set()
+
+
+def save_subscribers(subs: set[int]):
+    set_setting(SUBSCRIBERS_KEY, json.dumps(sorted(subs)))
+
+
+async def daily_job(context: ContextTypes.DEFAULT_TYPE):
+    """Send today's summary to every subscribed chat."""
+    subs = sorted(get_subscribers())
+    if not subs:
+        return
     try:
-        await context.bot.send_message(chat_id=chat_id, text="\n".join(lines))
+        text = await get_daily_summary()
     except Exception as e:
         logging.error("Error in daily_job: %s", e)
+        return
+    if text is None:
+        return
 
+    sem = asyncio.Semaphore(BROADCAST_CONCURRENCY)
 
-async def subscribe_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not await ensure_owner(update, context):
-        return
+    async def send(chat_id):
+        async with sem:
+            try:
+                await context.bot.send_message(chat_id=chat_id, text=text)
+            except RetryAfter as e:
+                await asyncio.sleep(e.retry_after)
+                await context.bot.send_message(chat_id=chat_id, text=text)
 
+    results = await asyncio.gather(*(send(c) for c in subs), return_exceptions=True)
+    for chat_id, result in zip(subs, results):
+        if isinstance(result, Exception):
+            logging.error("Error in daily_job for chat %s: %s", chat_id, result)
+
+
+def schedule_daily_job(job_queue):
+    """Register the single daily broadcast job (once)."""
+    if not job_queue.get_jobs_by_name("daily_broadcast"):
+        job_queue.run_daily(daily_job, time=DAILY_SUMMARY_TIME, name="daily_broadcast")
+
+
+async def subscribe_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if context.job_queue is None:
         await update.message.reply_text(
             "Job system is not available on this server, can't subscribe."
         )
         return
 
-    chat_id = update.effective_chat.id
-    job_name = f"daily_{chat_id}"
-
-    for job in context.job_queue.get_jobs_by_name(job_name):
-        job.schedule_removal()
-
-    run_time = time(hour=9, minute=0, second=0)
-    context.job_queue.run_daily(
-        daily_job,
-        time=run_time,
-        name=job_name,
-        chat_id=chat_id,
-    )
+    subs = get_subscribers()
+    subs.add(update.effective_chat.id)
+    save_subscribers(subs)
+    schedule_daily_job(context.job_queue)
 
     await update.message.reply_text(
         "✅ Subscribed to daily farm summary at 09:00.\nUse /unsubscribe to stop."
@@ -3501,9 +3711,6 @@ async def subscribe_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 async def unsubscribe_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not await ensure_owner(update, context):
-        return
-
     if context.job_queue is None:
         await update.message.reply_text(
             "Job system is not available on this server, can't unsubscribe."
@@ -3511,46 +3718,121 @@ async def unsubscribe_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     chat_id = update.effective_chat.id
-    job_name = f"daily_{chat_id}"
-    jobs = context.job_queue.get_jobs_by_name(job_name)
+    subs = get_subscribers()
 
-    if not jobs:
+    if chat_id not in subs:
         await update.message.reply_text("You are not subscribed.")
         return
 
-    for job in jobs:
-        job.schedule_removal()
+    subs.discard(chat_id)
+    save_subscribers(subs)
 
     await update.message.reply_text("❌ Unsubscribed from daily summary.")
 
 
+# callback_data -> command handler for menu_callback; the handler replies
+# with a new message, so the menu message keeps its buttons as they are.
+# Defined here because the handlers above must exist first.
+MENU_ACTIONS = {
+    "MENU_RABBITS_ALL": rabbits_cmd,
+    "MENU_RABBITS_ACTIVE": active_cmd,
+    "BREED_TODAY": today_cmd,
+    "MONEY_PROFIT": profit_cmd,
+    "TASKS_LIST": tasklist_cmd,
+    "STATS_SUMMARY": farmsummary_cmd,
+}
+
+
+# (command name(s), handler) registered by build_app behind OWNER_FILTER.
+# /whoami is the one open command and is registered separately.
+OWNER_COMMANDS = (
+    # core
+    ("start", start_cmd),
+    ("help", start_cmd),
+    # menu system
+    ("menu", menu_cmd),
+    ("achievements", achievements_cmd),
+    # rabbits
+    ("rabbits", rabbits_cmd),
+    ("active", active_cmd),
+    ("setcage", setcage_cmd),
+    ("setparents", setparents_cmd),
+    ("checkpair", checkpair_cmd),
+    ("markdead", markdead_cmd),
+    ("deleterabbit", deleterabbit_cmd),
+    ("resetfarm", resetfarm_cmd),
+    # exports & backup
+    (tuple(CSV_EXPORTS), export_cmd),
+    ("backupdb", backupdb_cmd),
+    # daily summary
+    ("subscribe", subscribe_cmd),
+    ("unsubscribe", unsubscribe_cmd),
+)
+
+
 # ================== HEALTHCHECK HTTP SERVER FOR RENDER ==================
 
-class HealthHandler(BaseHTTPRequestHandler):
-    def do_GET(self):
-        self.send_response(200)
-        self.end_headers()
-        self.wfile.write(b"OK")
+# Served by the bot's own event loop, so Render sees a port without a
+# separate server thread. main() starts it before the Application is
+# initialized: a slow Telegram API or a bad token must not keep the port
+# closed. It is closed again from post_shutdown.
+_health_server = None
+HEALTH_REQUEST_TIMEOUT = 10
+
 
-    def do_HEAD(self):
-        # So Render's HEAD check doesn't show 501
-        self.send_response(200)
-        self.end_headers()
+async def handle_health(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """Answer any request with 200 OK; HEAD gets no body (so Render's check doesn't show 501)."""
+    try:
+        async with asyncio.timeout(HEALTH_REQUEST_TIMEOUT):
+            request_line = await reader.readline()
+            # skip the headers, we don't need them
+            while await reader.readline() not in (b"\r\n", b"\n", b""):
+                pass
+            body = b"" if request_line.startswith(b"HEAD") else b"OK"
+            writer.write(
+                b"HTTP/1.0 200 OK\r\nContent-Type: text/plain\r\n"
+                b"Content-Length: 2\r\nConnection: close\r\n\r\n" + body
+            )
+            await writer.drain()
+    except (ConnectionError, TimeoutError, ValueError, asyncio.LimitOverrunError):
+        # ValueError: readline() on a line over the 64 KiB stream limit
+        pass
+    finally:
+        writer.close()
 
 
-def start_http_server():
+async def start_health_server():
+    global _health_server
     port = int(os.environ.get("PORT", "10000"))
-    server = HTTPServer(("0.0.0.0", port), HealthHandler)
+    _health_server = await asyncio.start_server(handle_health, "0.0.0.0", port)
     logging.info("Healthcheck HTTP server listening on port %s", port)
-    server.serve_forever()
+
+
+async def stop_health_server(application: Application):
+    global _health_server
+    if _health_server is not None:
+        _health_server.close()
+        await _health_server.wait_closed()
+        _health_server = None
 
 
 # ================== MAIN ==================
 
 def build_app() -> Application:
-    app = Application.builder().token(BOT_TOKEN).build()
+    app = (
+        Application.builder()
+        .token(BOT_TOKEN)
+        .persistence(PicklePersistence(filepath=STATE_FILE))
+        # No link previews: names and notes echo user text, which may hold URLs
+        .defaults(Defaults(link_preview_options=LinkPreviewOptions(is_disabled=True)))
+        .post_shutdown(stop_health_server)
+        .build()
+    )
 
     # --- Add-rabbit wizard conversation ---
+    # Only the owner can enter the wizard (addrabbit_start checks), and the
+    # states are filtered too so the steps don't need their own checks.
+    wizard_text = filters.TEXT & ~filters.COMMAND & OWNER_FILTER
     addrabbit_conv = ConversationHandler(
         entry_points=[
             # works when you type /addrabbit
@@ -3561,36 +3843,38 @@ def build_app() -> Application:
         states={
             ADD_NAME: [
                 MessageHandler(
-                    filters.TEXT & ~filters.COMMAND,
+                    wizard_text,
                     addrabbit_name,
                 )
             ],
             ADD_SEX: [
                 MessageHandler(
-                    filters.TEXT & ~filters.COMMAND,
+                    wizard_text,
                     addrabbit_sex,
                 )
             ],
             ADD_CAGE: [
                 MessageHandler(
-                    filters.TEXT & ~filters.COMMAND,
+                    wizard_text,
                     addrabbit_cage,
                 )
             ],
             ADD_SECTION: [
                 MessageHandler(
-                    filters.TEXT & ~filters.COMMAND,
+                    wizard_text,
                     addrabbit_section,
                 )
             ],
             ADD_WEIGHT: [
                 MessageHandler(
-                    filters.TEXT & ~filters.COMMAND,
+                    wizard_text,
                     addrabbit_weight,
                 )
             ],
         },
         fallbacks=[CommandHandler("cancel", addrabbit_cancel)],
+        name="addrabbit",
+        persistent=True,
     )
 
     # IMPORTANT: this must be added BEFORE the generic CallbackQueryHandler(menu_callback)
@@ -3600,40 +3884,36 @@ def build_app() -> Application:
     app.add_handler(addrabbit_conv)
 
     # =============================
-    # CORE COMMANDS
+    # COMMANDS (see OWNER_COMMANDS)
     # =============================
-    app.add_handler(CommandHandler("start", start_cmd))
-    app.add_handler(CommandHandler("help", start_cmd))
     app.add_handler(CommandHandler("whoami", whoami_cmd))
+    for command, callback in OWNER_COMMANDS:
+        app.add_handler(CommandHandler(command, callback, filters=OWNER_FILTER))
 
     # =============================
     # MENU SYSTEM
     # =============================
-    app.add_handler(CommandHandler("menu", menu_cmd))
-    app.add_handler(CommandHandler("achievements", achievements_cmd))
     app.add_handler(CallbackQueryHandler(menu_callback))
 
-    # =============================
-    # RABBIT COMMANDS
-    # =============================
-    app.add_handler(CommandHandler("rabbits", rabbits_cmd))
-    app.add_handler(CommandHandler("active", active_cmd))
-    app.add_handler(CommandHandler("setcage", setcage_cmd))
-    app.add_handler(CommandHandler("setparents", setparents_cmd))
-    app.add_handler(CommandHandler("checkpair", checkpair_cmd))
-    app.add_handler(CommandHandler("markdead", markdead_cmd))
-    app.add_handler(CommandHandler("deleterabbit", deleterabbit_cmd))
-    app.add_handler(CommandHandler("resetfarm", resetfarm_cmd))
-
-    # =============================
-    # EXPORTS & BACKUP
-    # =============================
-    app.add_handler(CommandHandler("export_rabbits", export_rabbits_cmd))
-    app.add_handler(CommandHandler("export_breedings", export_breedings_cmd))
-    app.add_handler(CommandHandler("export_sales", export_sales_cmd))
-    app.add_handler(CommandHandler("export_expenses", export_expenses_cmd))
-    app.add_handler(CommandHandler("backupdb", backupdb_cmd))
+    # Registered last: non-owners using one of OWNER_COMMANDS get the refusal;
+    # any other command is ignored, as unregistered commands always were.
+    owner_command_names = [
+        name
+        for command, _ in OWNER_COMMANDS
+        for name in ((command,) if isinstance(command, str) else command)
+    ]
+    owner_command_re = re.compile(
+        r"^/(?:%s)(?:@\w+)?(?:\s|$)" % "|".join(map(re.escape, owner_command_names)),
+        re.IGNORECASE,
+    )
+    app.add_handler(MessageHandler(
+        filters.COMMAND & filters.Regex(owner_command_re) & ~OWNER_FILTER,
+        not_owner_cmd,
+    ))
 
+    # Daily summary for chats stored by /subscribe
+    if app.job_queue is not None:
+        schedule_daily_job(app.job_queue)
 
     return app
 
@@ -3643,12 +3923,21 @@ def main():
     init_db()
 
     app = build_app()
-    app.run_polling()
+
+    # run_polling() runs on the current event loop; bind the health port on
+    # it first so it is open while the bot initializes and connects.
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    loop.run_until_complete(start_health_server())
+
+    # Only ask Telegram for what we handle; long-poll 30 s per getUpdates call
+    app.run_polling(
+        allowed_updates=[Update.MESSAGE, Update.CALLBACK_QUERY],
+        timeout=30,
+    )
 
 
 if __name__ == "__main__":
-    # Start tiny HTTP healthcheck server in background so Render sees a port
-    threading.Thread(target=start_http_server, daemon=True).start()
     main()
 
 